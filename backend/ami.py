@@ -12,10 +12,13 @@ import os
 import re
 import time
 import asyncio
-from typing import Any, Dict, Optional, List, Set, Callable, Awaitable
+from collections import Counter
+from typing import Any, Dict, Optional, List, Set, Callable, Awaitable, Mapping
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from enum import IntEnum
+from operator import itemgetter
+from types import MappingProxyType
 
 # Import CRM connector + call-data sync helpers
 try:
@@ -127,6 +130,20 @@ def _queue_member_status(code: str) -> str:
 _RE_EXT_FROM_CHANNEL = re.compile(r'/(\d+)-')
 _RE_CHANNEL_TYPE = re.compile(r'/([^-]+)-')
 
+# Width of the Channel column in the console tables; info['channel_short'] is
+# truncated to this once when the channel is recorded, not on every redraw.
+CHANNEL_COL_WIDTH = 30
+
+# Active-calls console table, hoisted so the format spec is parsed once.
+_ACTIVE_ROW_FMT = "{:<10} {:<12} {:<20} {:<12} {:<12} {:<30}".format
+_ACTIVE_HEADER  = "\n" + _ACTIVE_ROW_FMT('Ext', 'State', 'Talking To', 'Duration', 'Talk Time', 'Channel')
+_ACTIVE_RULE    = "-" * 110
+_ACTIVE_BANNER  = "=" * 110
+
+# Sort keys for queue_entries values (C-level key extraction instead of lambdas).
+_QUEUE_POSITION_KEY = itemgetter('queue', 'position')
+_POSITION_KEY       = itemgetter('position')
+
 
 class ExtensionStatus(IntEnum):
     NOT_FOUND=-1; IDLE=0; IN_USE=1; BUSY=2; UNAVAILABLE=4
@@ -215,6 +232,7 @@ class AMIExtensionsMonitor:
         self._event_task: Optional[asyncio.Task] = None
         self._read_buffer: str = ""  # Buffer for partial messages
         self._read_lock: asyncio.Lock = asyncio.Lock()  # Prevent concurrent reads
+        self._stop_event: asyncio.Event = asyncio.Event()  # Set by disconnect() to release monitor_extensions
 
         # Live state
         self.extensions:   Dict[str, Dict] = {}   # ext -> last ExtensionStatus response
@@ -225,6 +243,7 @@ class AMIExtensionsMonitor:
         self.monitored:    Set[str]        = set()
         self.dnd:          Set[str]        = set()   # extensions with Do-Not-Disturb enabled (AstDB DND family)
         self._refresh_event: Optional[asyncio.Event] = None  # Signal for live monitor refresh
+        self._calls_dirty: bool = True  # active_calls changed by events since the last sync_active_calls()
         self._event_callbacks: List[Callable[[Dict[str, str]], Awaitable[None]]] = []  # Event callbacks
         # Sink for EVERY parsed AMI event (System Logs panel) — see set_raw_event_sink.
         self._raw_event_sink: Optional[Callable[[Dict[str, str]], None]] = None
@@ -279,6 +298,7 @@ class AMIExtensionsMonitor:
     async def disconnect(self):
         """Async disconnect from AMI server."""
         self.running = False
+        self._stop_event.set()
         
         # Cancel event reading task
         if self._event_task and not self._event_task.done():
@@ -714,6 +734,7 @@ class AMIExtensionsMonitor:
                     
                     info.update({
                         'channel': ch,
+                        'channel_short': ch[:CHANNEL_COL_WIDTH],
                         'callerid': callerid,
                         'state': state or 'Up',
                         'destination': connected,
@@ -724,6 +745,7 @@ class AMIExtensionsMonitor:
 
         # Only replace state after successful parsing
         self.active_calls = new_active_calls
+        self._calls_dirty = False
         self.ch2ext = new_ch2ext
         self.ch_callerid = new_ch_callerid
         # Keep destch2ext as it tracks ongoing dial attempts
@@ -735,21 +757,30 @@ class AMIExtensionsMonitor:
         
         # Clean up queue entries and uniqueid mappings for channels that no longer exist
         new_ch2uniqueid = {}
+        emptied_queues: Set[str] = set()
         for ch, uniqueid in self.ch2uniqueid.items():
             if ch in new_ch2ext_set:
                 new_ch2uniqueid[ch] = uniqueid
             elif uniqueid in self.queue_entries:
                 # Channel is gone but queue entry exists - remove it
                 entry = self.queue_entries.pop(uniqueid)
-                queue = entry.get('queue', '')
-                if queue in self.queues:
-                    waiting_count = sum(1 for e in self.queue_entries.values() if e.get('queue') == queue)
-                    self.queues[queue]['calls_waiting'] = waiting_count
+                emptied_queues.add(entry.get('queue', ''))
         self.ch2uniqueid = new_ch2uniqueid
+        if emptied_queues:
+            self._recount_waiting(emptied_queues)
 
         log.info(f"✅ Synced: {len(self.active_calls)} active call(s)")
         return self.active_calls
 
+    def _events_live(self) -> bool:
+        """True while the event reader is running, i.e. active_calls is kept current by events."""
+        return bool(self.running and self._event_task and not self._event_task.done())
+
+    async def _sync_calls_if_stale(self):
+        """Re-sync active_calls only if events changed it since the last sync (or no reader runs)."""
+        if self._calls_dirty or not self._events_live():
+            await self.sync_active_calls()
+
     # ------------------------------------------------------------------
     # Event loop
     # ------------------------------------------------------------------
@@ -765,6 +796,12 @@ class AMIExtensionsMonitor:
         'UserEvent'
     })
 
+    # Events whose handlers add, remove or re-point active_calls entries.
+    CALL_STATE_EVENTS = frozenset({
+        'Newchannel','Hangup','Newstate','Dial','DialBegin','DialEnd',
+        'Bridge','NewCallerid',
+    })
+
     async def _dispatch_async(self, raw: str):
         """Async event dispatcher - processes AMI events and calls handlers."""
         p = _parse(raw)
@@ -793,6 +830,8 @@ class AMIExtensionsMonitor:
                 await handler(p, ts)
             else:
                 handler(p, ts)
+            if ev in self.CALL_STATE_EVENTS:
+                self._calls_dirty = True
             
             # Call registered event callbacks
             for callback in self._event_callbacks:
@@ -1474,6 +1513,7 @@ class AMIExtensionsMonitor:
         self.ch2ext[ch] = ext
         info = self._call_info(ext)
         info['channel'] = ch
+        info['channel_short'] = ch[:CHANNEL_COL_WIDTH]
         info['callerid'] = callerid
         if _meaningful(exten):
             info['exten'] = exten
@@ -1975,6 +2015,7 @@ class AMIExtensionsMonitor:
         # Always create/update the call info with channel
         info = self._call_info(ext)
         info['channel'] = ch  # Ensure channel is set!
+        info['channel_short'] = ch[:CHANNEL_COL_WIDTH]
         if 'state' not in info:
             info['state'] = 'Dialing'
         info['destchannel'] = destch
@@ -2008,6 +2049,7 @@ class AMIExtensionsMonitor:
         if dest_ext and dest_ext not in DIALPLAN_CTX:
             dest_info = self._call_info(dest_ext)
             dest_info['channel'] = destch
+            dest_info['channel_short'] = destch[:CHANNEL_COL_WIDTH]
             if 'state' not in dest_info:
                 dest_info['state'] = 'Ringing'
             dest_info['caller'] = ext
@@ -2065,6 +2107,7 @@ class AMIExtensionsMonitor:
             if dest_info:
                 if destch:
                     dest_info['channel'] = destch
+                    dest_info['channel_short'] = destch[:CHANNEL_COL_WIDTH]
                     self.ch2ext[destch] = dest_ext
                 if 'caller' not in dest_info and ext:
                     dest_info['caller'] = ext
@@ -2935,6 +2978,7 @@ class AMIExtensionsMonitor:
                 elif current_event == 'QueueEntry' and 'queue' in current_item and 'uniqueid' in current_item:
                     self._add_queue_entry(current_item)
         
+        self._recount_waiting()
         log.info(f"Synced {len(self.queues)} queues, {len(self.queue_members)} members, {len(self.queue_entries)} waiting callers")
     
     def _add_queue_member(self, item: dict):
@@ -2997,14 +3041,25 @@ class AMIExtensionsMonitor:
             'position': item.get('position', 0),
             'entry_time': entry_time
         }
-        
-        # Update queue calls_waiting count
-        if q_name in self.queues:
-            waiting_count = sum(1 for e in self.queue_entries.values() if e.get('queue') == q_name)
-            self.queues[q_name]['calls_waiting'] = waiting_count
+        # calls_waiting is recounted once by sync_queue_status after all entries are added
 
-    async def list_queue_entries(self, queue: str = None) -> Dict[str, Dict]:
-        """List callers waiting in queues. If queue is None, list all queue entries."""
+    def _recount_waiting(self, queues=None):
+        """Recompute calls_waiting from queue_entries in a single pass.
+
+        With *queues* given, only those queues are updated (to 0 if they have no
+        entries left); otherwise every queue that has at least one entry is updated.
+        """
+        counts = Counter(e.get('queue') for e in self.queue_entries.values())
+        for q in (counts if queues is None else queues):
+            meta = self.queues.get(q)
+            if meta is not None:
+                meta['calls_waiting'] = counts.get(q, 0)
+
+    async def list_queue_entries(self, queue: str = None, snapshot: bool = False) -> Mapping[str, Dict]:
+        """List callers waiting in queues. If queue is None, list all queue entries.
+
+        Returns a read-only live view of queue_entries; pass snapshot=True for a copy.
+        """
         if not queue:
             log.info(f"\n{'Queue':<20} {'Caller ID':<20} {'Position':<12} {'Wait Time':<15}")
             log.info("-" * 70)
@@ -3012,7 +3067,8 @@ class AMIExtensionsMonitor:
             if not self.queue_entries:
                 log.info("  No callers waiting in queues")
             else:
-                for uniqueid, entry in sorted(self.queue_entries.items(), key=lambda x: (x[1].get('queue', ''), x[1].get('position', 0))):
+                # Every entry writer sets 'queue' and 'position', so itemgetter is safe here.
+                for entry in sorted(self.queue_entries.values(), key=_QUEUE_POSITION_KEY):
                     queue_name = entry.get('queue', '')
                     callerid = entry.get('callerid', 'Unknown')
                     position = entry.get('position', 0)
@@ -3028,24 +3084,22 @@ class AMIExtensionsMonitor:
             log.info(f"{'Caller ID':<20} {'Position':<12} {'Wait Time':<15}")
             log.info("-" * 50)
             
-            found = False
-            for uniqueid, entry in sorted(self.queue_entries.items(), key=lambda x: x[1].get('position', 0)):
-                if entry.get('queue') == queue:
-                    found = True
-                    callerid = entry.get('callerid', 'Unknown')
-                    position = entry.get('position', 0)
-                    entry_time = entry.get('entry_time')
-                    wait_time = "---"
-                    if entry_time:
-                        wait_duration = datetime.now() - entry_time
-                        wait_time = _format_duration(wait_duration)
-                    log.info(f"{callerid:<20} {position:<12} {wait_time:<15}")
-            
-            if not found:
+            waiting = [e for e in self.queue_entries.values() if e['queue'] == queue]
+            for entry in sorted(waiting, key=_POSITION_KEY):
+                callerid = entry.get('callerid', 'Unknown')
+                position = entry.get('position', 0)
+                entry_time = entry.get('entry_time')
+                wait_time = "---"
+                if entry_time:
+                    wait_duration = datetime.now() - entry_time
+                    wait_time = _format_duration(wait_duration)
+                log.info(f"{callerid:<20} {position:<12} {wait_time:<15}")
+            
+            if not waiting:
                 log.info("  No callers waiting in this queue")
         
         log.info("-" * 70)
-        return self.queue_entries.copy()
+        return self.queue_entries.copy() if snapshot else MappingProxyType(self.queue_entries)
 
     # ------------------------------------------------------------------
     # Monitor entry-points
@@ -3067,21 +3121,18 @@ class AMIExtensionsMonitor:
 
         await self._send_async('Events', {'EventMask': 'on'})
         self.running = True
+        self._stop_event.clear()
         
         # Start event reading task
         self._event_task = asyncio.create_task(self._read_events_async())
         
+        # Park until disconnect() sets the stop event (or we are cancelled / Ctrl+C);
+        # no periodic wake-ups just to poll self.running.
         try:
-            # Keep running until interrupted
-            while self.running:
-                try:
-                    await asyncio.sleep(0.5)
-                except asyncio.CancelledError:
-                    self.running = False
-                    break
-        except KeyboardInterrupt:
-            self.running = False
-        except asyncio.CancelledError:
+            await self._stop_event.wait()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            self._stop_event.set()
+        finally:
             self.running = False
 
     # ------------------------------------------------------------------
@@ -3093,8 +3144,12 @@ class AMIExtensionsMonitor:
             log.error("❌ Not connected to AMI")
             return False
 
-        await self.sync_active_calls()
-        ch = await self.get_active_channel(ext)
+        # Trust event-driven state when the reader is live; only fall back to a
+        # Status round-trip on a miss that a sync could plausibly fix.
+        ch = self.get_active_channel_sync(ext) if self._events_live() else None
+        if not ch:
+            await self._sync_calls_if_stale()
+            ch = await self.get_active_channel(ext)
         if not ch:
             log.error(f"❌ No active call on extension {ext}")
             return False
@@ -3126,19 +3181,14 @@ class AMIExtensionsMonitor:
         ch = self.get_active_channel_sync(source)
         if ch:
             return ch
-        # 2) Other leg: find a call where the "other party" is source, then get bridge peer channel
-        def _num_match(a: str, b: str) -> bool:
-            if a == b:
-                return True
-            if not a or not b:
-                return False
-            return a.lstrip("0") == b.lstrip("0")
-
+        # 2) Other leg: find a call where the "other party" is source, then get bridge peer channel.
+        # Numbers match ignoring leading zeros; normalize the search key once up front.
+        source_norm = source.lstrip("0")
         for ext, info in self.active_calls.items():
             talking_to = self._display_number(info, ext)
             if not talking_to or talking_to == "Unknown":
                 continue
-            if not _num_match(source, talking_to):
+            if talking_to != source and talking_to.lstrip("0") != source_norm:
                 continue
             agent_ch = info.get("channel")
             if not agent_ch:
@@ -3180,8 +3230,10 @@ class AMIExtensionsMonitor:
             log.error("❌ No destination provided for transfer")
             return False
 
-        await self.sync_active_calls()
-        ch = self._channel_for_transfer_source(ext)
+        ch = self._channel_for_transfer_source(ext) if self._events_live() else None
+        if not ch:
+            await self._sync_calls_if_stale()
+            ch = self._channel_for_transfer_source(ext)
         if not ch:
             log.error(f"❌ No active call on extension/number {ext}")
             return False
@@ -3270,8 +3322,10 @@ class AMIExtensionsMonitor:
     async def _chanspy(self, supervisor: str, target: str, options: str, label: str) -> bool:
         if not self.connected:
             return False
-        await self.sync_active_calls()
-        ch = await self.get_active_channel(target)
+        ch = self.get_active_channel_sync(target) if self._events_live() else None
+        if not ch:
+            await self._sync_calls_if_stale()
+            ch = await self.get_active_channel(target)
         if not ch:
             log.error(f"❌ No active call on extension {target}")
             return False
@@ -3337,11 +3391,15 @@ class AMIExtensionsMonitor:
     # ------------------------------------------------------------------
     # Display helpers
     # ------------------------------------------------------------------
-    async def list_active_calls(self, sync=True) -> Dict[str,Dict]:
+    async def list_active_calls(self, sync=True, snapshot=False) -> Mapping[str,Dict]:
+        """Log the active calls table.
+
+        Returns a read-only live view of active_calls; pass snapshot=True for a copy.
+        """
         if sync:
             await self.sync_active_calls()
-        log.info(f"\n{'Ext':<10} {'State':<12} {'Talking To':<20} {'Duration':<12} {'Talk Time':<12} {'Channel':<30}")
-        log.info("-" * 110)
+        log.info(_ACTIVE_HEADER)
+        log.info(_ACTIVE_RULE)
         if not self.active_calls:
             log.info("  No active calls")
         for ext, info in self.active_calls.items():
@@ -3356,10 +3414,10 @@ class AMIExtensionsMonitor:
                     talk_time = datetime.now() - info['answer_time']
                     talk_time_str = _format_duration(talk_time)
             
-            log.info(f"{ext:<10} {info.get('state','?'):<12} "
-                  f"{self._display_number(info, ext):<20} {duration_str:<12} {talk_time_str:<12} {info.get('channel','')[:30]:<30}")
-        log.info("-" * 110)
-        return self.active_calls.copy()
+            log.info(_ACTIVE_ROW_FMT(ext, info.get('state','?'), self._display_number(info, ext),
+                                     duration_str, talk_time_str, info.get('channel_short','')))
+        log.info(_ACTIVE_RULE)
+        return self.active_calls.copy() if snapshot else MappingProxyType(self.active_calls)
 
     async def monitor_active_calls_live(self):
         """Continuously monitor and display active calls in real-time. Updates only when events occur."""
@@ -3390,13 +3448,14 @@ class AMIExtensionsMonitor:
         log.info("=" * 80)
         
         last_count = -1
+        last_sig = None           # hash of the last rendered rows (frame diffing)
+        last_render_second = -1   # wall-clock second of the last full redraw
         monitor_running = True
         
         def _display():
             """Display the current active calls."""
-            # Clear screen (ANSI escape sequence)
-            log.info("\033[2J\033[H", end='')
-            
+            nonlocal last_count, last_sig, last_render_second
+
             # Use event-driven state directly (don't sync - it overwrites event data)
             # Filter to show only valid extensions with channels (exclude dialplan contexts, trunks, external numbers)
             # Also hide the callee side of internal calls (show only caller's perspective)
@@ -3424,59 +3483,72 @@ class AMIExtensionsMonitor:
                     continue
                 active[ext] = info
             count = len(active)
+
+            # Resolve the material (non-clock) part of each row first so an unchanged
+            # frame can be detected before doing any formatting.
+            rows = []
+            for ext, info in sorted(active.items()):
+                state = info.get('state', '?')
+                # For outgoing calls, use dest_state (from destination channel) for better display
+                dest_state = info.get('dest_state', '')
+                if dest_state:
+                    if dest_state in ('Ringing', 'Ring'):
+                        state = 'Ringing'
+                    elif dest_state == 'Up':
+                        state = 'Up'
+                else:
+                    # Fallback: check internal destination's state
+                    dest_ext = info.get('exten') or info.get('original_destination', '')
+                    if dest_ext and dest_ext in self.active_calls:
+                        ds = self.active_calls[dest_ext].get('state', '')
+                        if ds == 'Ringing':
+                            state = 'Ringing'
+                        elif ds == 'Up' and state != 'Up':
+                            state = 'Up'
+                rows.append((ext, state, self._display_number(info, ext), info.get('channel_short', ''),
+                             info.get('start_time'), info.get('answer_time')))
+
+            now = datetime.now()
+            now_second = int(now.timestamp())
+            sig = hash(tuple(rows))
+            # Duration columns only move when some row has a running timer.
+            ticking = any(r[4] for r in rows)
+            if sig == last_sig and (not ticking or now_second == last_render_second):
+                log.info(f"Last updated: {now.strftime('%Y-%m-%d %H:%M:%S')}")
+                return
+            last_sig = sig
+            last_render_second = now_second
+
+            # Clear screen (ANSI escape sequence)
+            log.info("\033[2J\033[H")
             
             # Header
-            log.info("=" * 110)
-            log.info(f"  LIVE ACTIVE CALLS MONITOR  |  {count} active call(s)  |  {datetime.now().strftime('%H:%M:%S')}")
-            log.info("=" * 110)
-            log.info(f"\n{'Ext':<10} {'State':<12} {'Talking To':<20} {'Duration':<12} {'Talk Time':<12} {'Channel':<30}")
-            log.info("-" * 110)
+            log.info(_ACTIVE_BANNER)
+            log.info(f"  LIVE ACTIVE CALLS MONITOR  |  {count} active call(s)  |  {now.strftime('%H:%M:%S')}")
+            log.info(_ACTIVE_BANNER)
+            log.info(_ACTIVE_HEADER)
+            log.info(_ACTIVE_RULE)
             
-            if not active:
+            if not rows:
                 log.info("  No active calls")
             else:
-                for ext, info in sorted(active.items()):
-                    state = info.get('state', '?')
-                    talking_to = self._display_number(info, ext)
-                    channel = info.get('channel', '')[:30]
-                    
+                for ext, state, talking_to, channel, start_time, answer_time in rows:
                     # Calculate duration
                     duration_str = "---"
                     talk_time_str = "---"
-                    if 'start_time' in info:
-                        duration = datetime.now() - info['start_time']
-                        duration_str = _format_duration(duration)
-                        
-                        if info.get('answer_time'):
-                            talk_time = datetime.now() - info['answer_time']
-                            talk_time_str = _format_duration(talk_time)
-                    
-                    # For outgoing calls, use dest_state (from destination channel) for better display
-                    dest_state = info.get('dest_state', '')
-                    if dest_state:
-                        if dest_state in ('Ringing', 'Ring'):
-                            state = 'Ringing'
-                        elif dest_state == 'Up':
-                            state = 'Up'
-                    else:
-                        # Fallback: check internal destination's state
-                        dest_ext = info.get('exten') or info.get('original_destination', '')
-                        if dest_ext and dest_ext in self.active_calls:
-                            ds = self.active_calls[dest_ext].get('state', '')
-                            if ds == 'Ringing':
-                                state = 'Ringing'
-                            elif ds == 'Up' and state != 'Up':
-                                state = 'Up'
+                    if start_time:
+                        duration_str = _format_duration(now - start_time)
+                        if answer_time:
+                            talk_time_str = _format_duration(now - answer_time)
                     
-                    log.info(f"{ext:<10} {state:<12} {talking_to:<20} {duration_str:<12} {talk_time_str:<12} {channel:<30}")
+                    log.info(_ACTIVE_ROW_FMT(ext, state, talking_to, duration_str, talk_time_str, channel))
             
-            log.info("-" * 110)
+            log.info(_ACTIVE_RULE)
             
-            log.info(f"\nLast updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            log.info(f"\nLast updated: {now.strftime('%Y-%m-%d %H:%M:%S')}")
             log.info("Press Ctrl+C to stop...")
             
             # Show change notification
-            nonlocal last_count
             if last_count != count and last_count != -1:
                 if count > last_count:
                     log.info(f"\n🔔 New call detected! ({last_count} → {count})")
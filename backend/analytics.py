@@ -37,6 +37,11 @@ except ImportError:
     mysql = None
     Error = Exception
 
+try:
+    from db_manager import _get_connection as _pooled_connection
+except ImportError:  # pragma: no cover
+    _pooled_connection = None
+
 try:
     from db_manager import prune_stale_device_tokens as _prune_stale_tokens
 except ImportError:  # pragma: no cover
@@ -76,10 +81,17 @@ def _opdesk_config():
     }
 
 
+def _connect(config):
+    """Check a connection out of db_manager's per-database pool (close() returns it)."""
+    if _pooled_connection is not None:
+        return _pooled_connection(config)
+    return mysql.connector.connect(**config)
+
+
 @contextmanager
 def _opdesk_db(write=False):
     """Context manager: open OpDesk DB, yield cursor, commit on success (if write=True), always close."""
-    conn = mysql.connector.connect(**_opdesk_config())
+    conn = _connect(_opdesk_config())
     cursor = conn.cursor(dictionary=True)
     try:
         yield cursor
@@ -93,7 +105,7 @@ def _opdesk_db(write=False):
 @contextmanager
 def _cdr_db():
     """Context manager: open CDR DB, yield dict cursor, always close."""
-    conn = mysql.connector.connect(**_cdr_config())
+    conn = _connect(_cdr_config())
     cursor = conn.cursor(dictionary=True)
     try:
         yield cursor
@@ -390,10 +402,37 @@ def compute_agent_adherence(date_from: str, date_to: str, allowed_agents=None) -
 #
 # Inner subqueries include date filtering (with 1-day buffer) to avoid
 # full-table scans on large CDR tables.
-# Expects 6 base params: [date_from, date_to] × 3
+# Expects 4 base params: [date_from, date_to] × 2
+
+
+def _first_last_legs(window: str) -> str:
+    """FROM body pairing each call's first and last CDR leg.
+
+    One GROUP BY linkedid over the `window` slice of cdr yields both sequence
+    bounds (this used to be two GROUP BY scans, each materializing a `c.*` copy
+    of the matching rows). ROW_NUMBER() would drop the self-joins but needs
+    MySQL 8 / MariaDB 10.2; OpDesk still supports MariaDB 5.5.
+    """
+    return f"""
+        (
+            SELECT linkedid, MIN(sequence) AS min_seq, MAX(sequence) AS max_seq
+            FROM cdr
+            WHERE {window}
+            GROUP BY linkedid
+        ) legs
+    JOIN cdr first_leg
+        ON first_leg.linkedid = legs.linkedid AND first_leg.sequence = legs.min_seq
+    JOIN cdr last_leg
+        ON last_leg.linkedid = legs.linkedid AND last_leg.sequence = legs.max_seq"""
+
+
+# Takes [date_from, date_to]; 2-day upper buffer for calls spanning midnight.
+_CALL_LEGS_FROM = _first_last_legs("calldate >= %s AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
+# Takes [hour_start, next_hour] for the hourly aggregation.
+_HOUR_LEGS_FROM = _first_last_legs("calldate >= %s AND calldate < %s")
 
 def _queue_cdr_sql(extra_sql=""):
-    """Build the queue CDR SQL. Caller must supply 6 base date params + extra_params."""
+    """Build the queue CDR SQL. Caller must supply 4 base date params + extra_params."""
     return f"""
     SELECT
         first_leg.calldate,
@@ -409,29 +448,7 @@ def _queue_cdr_sql(extra_sql=""):
         END                             AS wait_secs,
         {_AGENT_EXT_EXPR}              AS agent_ext,
         first_leg.linkedid
-    FROM
-        (
-            SELECT c.*
-            FROM cdr c
-            JOIN (
-                SELECT linkedid, MIN(sequence) AS min_seq
-                FROM cdr
-                WHERE calldate >= %s
-                  AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)
-                GROUP BY linkedid
-            ) x ON c.linkedid = x.linkedid AND c.sequence = x.min_seq
-        ) first_leg
-    JOIN (
-            SELECT c.*
-            FROM cdr c
-            JOIN (
-                SELECT linkedid, MAX(sequence) AS max_seq
-                FROM cdr
-                WHERE calldate >= %s
-                  AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)
-                GROUP BY linkedid
-            ) x ON c.linkedid = x.linkedid AND c.sequence = x.max_seq
-        ) last_leg ON first_leg.linkedid = last_leg.linkedid
+    FROM {_CALL_LEGS_FROM}
     WHERE
         first_leg.lastapp = 'Queue'
         AND first_leg.calldate >= %s
@@ -442,7 +459,7 @@ def _queue_cdr_sql(extra_sql=""):
 
 def _run_queue_cdr(date_from: str, date_to: str, extra_sql: str = "", extra_params: list = None):
     """Execute the queue CDR base query and return rows."""
-    params = [date_from, date_to, date_from, date_to, date_from, date_to] + (extra_params or [])
+    params = [date_from, date_to, date_from, date_to] + (extra_params or [])
     try:
         with _cdr_db() as cursor:
             cursor.execute(_queue_cdr_sql(extra_sql), params)
@@ -464,7 +481,7 @@ _CALLER_EXT_EXPR = "SUBSTRING_INDEX(SUBSTRING_INDEX(first_leg.channel, '-', 1),
 def _all_cdr_sql(extra_sql=""):
     """Build CDR SQL for ALL calls (queue + outbound + internal).
     Includes extra fields (lastapp, dcontext, channel, dstchannel) for direction
-    classification in Python.  Caller must supply 6 base date params + extra_params."""
+    classification in Python.  Caller must supply 4 base date params + extra_params."""
     return f"""
     SELECT
         first_leg.calldate,
@@ -487,29 +504,7 @@ def _all_cdr_sql(extra_sql=""):
         first_leg.channel               AS channel,
         last_leg.dstchannel             AS dstchannel,
         first_leg.linkedid
-    FROM
-        (
-            SELECT c.*
-            FROM cdr c
-            JOIN (
-                SELECT linkedid, MIN(sequence) AS min_seq
-                FROM cdr
-                WHERE calldate >= %s
-                  AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)
-                GROUP BY linkedid
-            ) x ON c.linkedid = x.linkedid AND c.sequence = x.min_seq
-        ) first_leg
-    JOIN (
-            SELECT c.*
-            FROM cdr c
-            JOIN (
-                SELECT linkedid, MAX(sequence) AS max_seq
-                FROM cdr
-                WHERE calldate >= %s
-                  AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)
-                GROUP BY linkedid
-            ) x ON c.linkedid = x.linkedid AND c.sequence = x.max_seq
-        ) last_leg ON first_leg.linkedid = last_leg.linkedid
+    FROM {_CALL_LEGS_FROM}
     WHERE
         first_leg.calldate >= %s
         AND first_leg.calldate < DATE_ADD(%s, INTERVAL 1 DAY)
@@ -519,7 +514,7 @@ def _all_cdr_sql(extra_sql=""):
 
 def _run_all_cdr(date_from: str, date_to: str, extra_sql: str = "", extra_params: list = None):
     """Execute the all-call CDR query and return rows."""
-    params = [date_from, date_to, date_from, date_to, date_from, date_to] + (extra_params or [])
+    params = [date_from, date_to, date_from, date_to] + (extra_params or [])
     try:
         with _cdr_db() as cursor:
             cursor.execute(_all_cdr_sql(extra_sql), params)
@@ -780,15 +775,12 @@ def _compute_period_kpis_with_outbound(date_from, date_to, allowed_queues, allow
                                         thresholds, default_secs, short_abandon_secs, window_days):
     """Compute KPIs for a period including outbound metrics.
     Uses the same call_log data source as Call History for consistency."""
-    from call_log import call_log
+    from call_log import iter_call_log
 
     # Use call_log data source (same as Call History page)
     allowed_extensions = list(allowed_agents) if allowed_agents is not None else None
-    # enrich=False: analytics reuses the call-history data source but never reads
-    # recording paths or supervision flags, so skip that per-row work (no filesystem
-    # index walk, no supervision query) — a real saving when scanning a whole period.
-    all_rows = call_log(date_from=date_from, date_to=date_to,
-                        allowed_extensions=allowed_extensions, enrich=False)
+    all_rows = iter_call_log(date_from=date_from, date_to=date_to,
+                             allowed_extensions=allowed_extensions)
 
     # Apply queue scope for non-admin users
     if allowed_queues is not None:
@@ -932,7 +924,7 @@ def compute_agent_performance(
     Includes ALL calls (inbound, outbound, internal) — not just queue calls.
     Uses call_log for consistency with the rest of analytics.
     """
-    from call_log import call_log
+    from call_log import iter_call_log
 
     date_from, date_to = _default_dates(date_from, date_to)
     thresholds = sla_thresholds or get_sla_thresholds()
@@ -941,11 +933,8 @@ def compute_agent_performance(
 
     # Use call_log data source (same as Call History)
     allowed_extensions = list(allowed_agents) if allowed_agents is not None else None
-    # enrich=False: analytics reuses the call-history data source but never reads
-    # recording paths or supervision flags, so skip that per-row work (no filesystem
-    # index walk, no supervision query) — a real saving when scanning a whole period.
-    all_rows = call_log(date_from=date_from, date_to=date_to,
-                        allowed_extensions=allowed_extensions, enrich=False)
+    all_rows = iter_call_log(date_from=date_from, date_to=date_to,
+                             allowed_extensions=allowed_extensions)
 
     # Build per-agent stats from all calls
     # Each agent's extension comes from the 'extension' field (dstchannel extraction)
@@ -1049,35 +1038,13 @@ def compute_hourly_heatmap(
                     HOUR(first_leg.calldate)      AS hr,
                     COUNT(*)                      AS cnt,
                     SUM(CASE WHEN last_leg.disposition='ANSWERED' THEN 1 ELSE 0 END) AS answered_cnt
-                FROM
-                    (
-                        SELECT c.*
-                        FROM cdr c
-                        JOIN (
-                            SELECT linkedid, MIN(sequence) AS min_seq
-                            FROM cdr
-                            WHERE calldate >= %s
-                              AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)
-                            GROUP BY linkedid
-                        ) x ON c.linkedid=x.linkedid AND c.sequence=x.min_seq
-                    ) first_leg
-                JOIN (
-                        SELECT c.*
-                        FROM cdr c
-                        JOIN (
-                            SELECT linkedid, MAX(sequence) AS max_seq
-                            FROM cdr
-                            WHERE calldate >= %s
-                              AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)
-                            GROUP BY linkedid
-                        ) x ON c.linkedid=x.linkedid AND c.sequence=x.max_seq
-                    ) last_leg ON first_leg.linkedid=last_leg.linkedid
+                FROM {_CALL_LEGS_FROM}
                 WHERE first_leg.lastapp='Queue'
                   AND first_leg.calldate >= %s
                   AND first_leg.calldate < DATE_ADD(%s, INTERVAL 1 DAY)
                   {queue_cond}
                 GROUP BY dow, hr
-            """, [date_from, date_to, date_from, date_to, date_from, date_to] + qparams)
+            """, [date_from, date_to, date_from, date_to] + qparams)
             rows = cursor.fetchall()
     except Error as e:
         # Propagate so the API surfaces a 500 instead of returning an all-zero
@@ -1125,7 +1092,7 @@ def compute_drilldown(
     Returns paginated call records with analytics fields (wait_secs, sla_met).
     Uses the same data source as Call History (call_log module) for consistency.
     """
-    from call_log import (call_log, classify_cdr_direction, convert_channel_to_extension,
+    from call_log import (iter_call_log, classify_cdr_direction, convert_channel_to_extension,
                           map_call_outcome)
 
     date_from, date_to = _default_dates(date_from, date_to)
@@ -1134,11 +1101,8 @@ def compute_drilldown(
 
     # Use call_log data source (same as Call History page)
     allowed_extensions = list(allowed_agents) if allowed_agents is not None else None
-    # enrich=False: analytics reuses the call-history data source but never reads
-    # recording paths or supervision flags, so skip that per-row work (no filesystem
-    # index walk, no supervision query) — a real saving when scanning a whole period.
-    all_rows = call_log(date_from=date_from, date_to=date_to,
-                        allowed_extensions=allowed_extensions, enrich=False)
+    all_rows = iter_call_log(date_from=date_from, date_to=date_to,
+                             allowed_extensions=allowed_extensions)
 
     # Apply filters
     filtered = []
@@ -1227,15 +1191,15 @@ def compute_volume_trend(
     Returns list of {date, total_calls, answered_calls, abandoned_calls,
     outbound_total, outbound_answered} per day — one entry per day in the range.
 
-    Uses call_log() (same source as executive KPIs) so direction classification
+    Uses iter_call_log() (same source as executive KPIs) so direction classification
     goes through the single canonical classify_cdr_direction() in call_log.py.
     """
-    from call_log import call_log as get_call_log
+    from call_log import iter_call_log
 
     date_from, date_to = _default_dates(date_from, date_to)
     allowed_extensions = list(allowed_agents) if allowed_agents is not None else None
-    all_rows = get_call_log(date_from=date_from, date_to=date_to,
-                            allowed_extensions=allowed_extensions)
+    all_rows = iter_call_log(date_from=date_from, date_to=date_to,
+                             allowed_extensions=allowed_extensions)
 
     # Apply queue scope for inbound calls (same pattern as _compute_period_kpis_with_outbound)
     if allowed_queues is not None:
@@ -1309,7 +1273,7 @@ def refresh_hourly_bucket(
 
     try:
         with _cdr_db() as cursor:
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT
                     first_leg.dst            AS queue_ext,
                     last_leg.disposition,
@@ -1317,28 +1281,11 @@ def refresh_hourly_bucket(
                          THEN first_leg.duration - last_leg.billsec
                          ELSE first_leg.duration END AS wait_secs,
                     last_leg.billsec
-                FROM
-                    (SELECT c.* FROM cdr c
-                     JOIN (
-                        SELECT linkedid, MIN(sequence) AS ms
-                        FROM cdr
-                        WHERE calldate >= %s AND calldate < %s
-                        GROUP BY linkedid
-                     ) x ON c.linkedid=x.linkedid AND c.sequence=x.ms
-                    ) first_leg
-                JOIN (SELECT c.* FROM cdr c
-                      JOIN (
-                        SELECT linkedid, MAX(sequence) AS ms
-                        FROM cdr
-                        WHERE calldate >= %s AND calldate < %s
-                        GROUP BY linkedid
-                      ) x ON c.linkedid=x.linkedid AND c.sequence=x.ms
-                     ) last_leg ON first_leg.linkedid=last_leg.linkedid
+                FROM {_HOUR_LEGS_FROM}
                 WHERE first_leg.lastapp='Queue'
                   AND first_leg.calldate >= %s
                   AND first_leg.calldate < %s
             """, [hour_str, next_hour_str,
-                  hour_str, next_hour_str,
                   hour_str, next_hour_str])
             rows = cursor.fetchall()
     except Error as e:
@@ -1,3 +1,4 @@
+import functools
 import os
 import re
 import time
@@ -99,101 +100,158 @@ def map_call_outcome(cause=None, dial_status=None, answered=False,
     return FAILURE
 
 
-# Get root directory for Asterisk recordings from environment variable
+# (disposition, answered) -> outcome for the call-history path, which only has
+# those two signals. Built once from map_call_outcome so the row loop does a
+# single dict lookup; dispositions outside the CDR set fall back to the function.
+_STATUS_MAP = {
+    (disp, answered): map_call_outcome(disposition=disp, answered=answered)
+    for disp in (*_DISPOSITION_OUTCOME, '')
+    for answered in (False, True)
+}
+
+
+# Number-shape checks for classify_cdr_direction. Plain str scans rather than
+# regexes: they run several times per CDR row and skip SRE setup entirely.
+# Deliberately stricter than the old ^...\d...$ regexes: Unicode digits (e.g.
+# Arabic-Indic) are now rejected by isascii(), and so is a trailing '\n',
+# which '$' used to accept.
+def _is_ext(n: str) -> bool:
+    """Internal extension: 2-5 digits, no leading zero."""
+    return 2 <= len(n) <= 5 and n[0] != '0' and n.isascii() and n.isdigit()
+
+
+def _is_pstn(n: str) -> bool:
+    """External number: optional '+' then 7-15 digits."""
+    s = n[1:] if n.startswith('+') else n
+    return 7 <= len(s) <= 15 and s.isascii() and s.isdigit()
+
+
+def _is_feature(n: str) -> bool:
+    """Feature code such as *43 or *97."""
+    return len(n) > 1 and n[0] == '*' and n[1:].isascii() and n[1:].isdigit()
+
+
+# Keyword sets for classify_cdr_direction, each folded into one alternation so a
+# field is scanned once in C instead of once per keyword. Inputs are lowercased.
+_IN_CONTEXT_RE = re.compile(r"from-trunk|from-pstn|incoming|ext-did|ivr|queue")   # incl. any IVR
+_OUT_CONTEXT_RE = re.compile(r"from-internal|outbound|dialout")
+_TRUNK_CHANNEL_RE = re.compile(r"trunk|gw|provider|peer|dahdi")
+
+
+def _channel_prefix(channel) -> str:
+    """'PJSIP/Trunk1-0000002a' -> 'PJSIP/Trunk1' (per-call suffix removed)."""
+    return str(channel).rsplit("-", 1)[0]
 
 
 def classify_cdr_direction(cdr: dict) -> str:
     """
     Classify call direction (IN/OUT/INTERNAL) using weighted voting.
     """
-    # Extract and clean fields
-    src = str(cdr.get("src", "")).strip()
-    dst = str(cdr.get("dst", "")).strip()
-    dcontext = str(cdr.get("dcontext", "")).lower()
-    channel = str(cdr.get("channel", "")).lower()
-    dstchannel = str(cdr.get("dstchannel", "")).lower()
-    
-    votes = {"IN": 0, "OUT": 0, "INTERNAL": 0}
-    
-    # Patterns
-    is_ext = lambda n: bool(re.match(r"^[1-9]\d{1,4}$", n))
-    is_pstn = lambda n: bool(re.match(r"^\+?\d{7,15}$", n))
-    is_feature = lambda n: bool(re.match(r"^\*\d+$", n))
-    
-    src_ext, dst_ext = is_ext(src), is_ext(dst)
-    src_pstn, dst_pstn = is_pstn(src), is_pstn(dst)
+    return _classify_cdr_fields(cdr.get("src", ""), cdr.get("dst", ""),
+                                cdr.get("channel", ""), cdr.get("dstchannel", ""),
+                                cdr.get("dcontext", ""), cdr.get("lastapp", ""))
+
+
+def _classify_cdr_fields(src, dst, channel, dstchannel, dcontext, lastapp) -> str:
+    """classify_cdr_direction on already-unpacked CDR columns (streamed tuple rows)."""
+    # Extract and clean fields. Only src/dst are normalized per row; the
+    # low-cardinality text fields go into the memo key as-is and are lowercased
+    # inside _classify_direction, i.e. once per distinct value.
+    src = str(src).strip()
+    dst = str(dst).strip()
+    # Only the technology/peer prefix of a channel carries a trunk indicator; the
+    # trailing "-<hex id>" is unique per call and would defeat the memo below, so
+    # cut it here. The indicator can sit anywhere in the peer name
+    # ("PJSIP/etisalat-trunk"), so the prefix is still searched, not
+    # startswith-matched.
+    channel = _channel_prefix(channel)
+    dstchannel = _channel_prefix(dstchannel)
+
+    return _classify_direction(dcontext, channel, dstchannel, lastapp,
+                               _is_ext(src), _is_pstn(src),
+                               _is_ext(dst), _is_pstn(dst), _is_feature(dst))
+
+
+@functools.lru_cache(maxsize=4096)
+def _classify_direction(dcontext, channel: str, dstchannel: str, lastapp,
+                        src_ext: bool, src_pstn: bool,
+                        dst_ext: bool, dst_pstn: bool, dst_feature: bool) -> str:
+    """Weighted vote behind classify_cdr_direction, memoized on its reduced inputs.
+
+    Rows from the same extension/trunk/context share a key, so most of a page or
+    analytics period is answered from the cache. Text inputs arrive raw (any
+    case, possibly None) and are normalized here, on cache misses only."""
+    dcontext = str(dcontext).lower()
+    channel = channel.lower()
+    dstchannel = dstchannel.lower()
+    lastapp = str(lastapp).lower()
+
+    # Vote tallies as plain locals (no dict hashing on the per-row hot path)
+    v_in = v_out = v_internal = 0
     
     # Vote 1: Context (weight 4)
-    # Convert to lowercase for case-insensitive matching
-    dcontext_lower = dcontext.lower()
-    
     # Incoming keywords (including any IVR)
-    incoming_keywords = ["from-trunk", "from-pstn", "incoming", "ext-did", "ivr","queue"]
+    if _IN_CONTEXT_RE.search(dcontext):
+        v_in += 4
     
     # Outgoing keywords
-    outgoing_keywords = ["from-internal", "outbound", "dialout"]
-    
-    # Check all incoming keywords
-    if any(keyword in dcontext_lower for keyword in incoming_keywords):
-        votes["IN"] += 4
-    
-    # Check all outgoing keywords
-    if any(keyword in dcontext_lower for keyword in outgoing_keywords):
-        votes["OUT"] += 2
+    if _OUT_CONTEXT_RE.search(dcontext):
+        v_out += 2
     
     # Vote 2: Number patterns (weight 3-5)
     if src_ext and dst_pstn:
-        votes["OUT"] += 3
+        v_out += 3
     elif src_pstn and dst_ext:
-        votes["IN"] += 3
+        v_in += 3
     elif src_ext and dst_ext:
-        votes["INTERNAL"] += 5
-    elif src_ext and is_feature(dst):
+        v_internal += 5
+    elif src_ext and dst_feature:
         # Extension dialing a feature code (*43, *97, etc.) — treated as OUT
-        votes["OUT"] += 3
+        v_out += 3
     
     # Vote 3: Channels (weight 2)
-    trunk_indicators = ["trunk", "gw", "provider", "peer", "dahdi"]
-    if any(x in channel for x in trunk_indicators):
-        votes["IN"] += 2
-    if any(x in dstchannel for x in trunk_indicators):
-        votes["OUT"] += 2
+    if _TRUNK_CHANNEL_RE.search(channel):
+        v_in += 2
+    if _TRUNK_CHANNEL_RE.search(dstchannel):
+        v_out += 2
     
     # Vote 4: Last app (weight 3-2)
-    lastapp = str(cdr.get("lastapp", "")).lower()
     if lastapp == "queue" or lastapp == "ivr" or lastapp == "stasis":
-        votes["IN"] += 2
+        v_in += 2
     elif lastapp == "page" or lastapp == "chanspy" or lastapp == "echo":
-        votes["INTERNAL"] += 3
+        v_internal += 3
     elif lastapp == "background":
         if src_ext:
-            votes["INTERNAL"] += 3        
-    # Return max votes
-    max_votes = max(votes.values())
-    if max_votes == 0:
-        # Feature codes from extensions → OUT
-        if src_ext and (is_feature(dst) or dst_ext is False):
-            return "OUT"
-        return "INTERNAL" if src_ext else "UNKNOWN"
-    
-    # Tie breaker: IN vs OUT
-    if votes["IN"] == votes["OUT"] == max_votes:
-        return "IN" if src_pstn else "OUT"
-    
-    return max(votes, key=votes.get)
+            v_internal += 3        
+    # Return max votes. Ties resolve in IN / OUT / INTERNAL order.
+    if v_in >= v_out and v_in >= v_internal:
+        if v_in == 0:
+            # No votes at all. Feature codes from extensions → OUT
+            if src_ext and (dst_feature or dst_ext is False):
+                return "OUT"
+            return "INTERNAL" if src_ext else "UNKNOWN"
+        # Tie breaker: IN vs OUT
+        if v_in == v_out:
+            return "IN" if src_pstn else "OUT"
+        return "IN"
+    if v_out >= v_internal:
+        return "OUT"
+    return "INTERNAL"
+
+
+# Peer part of a channel name: 'PJSIP/101-0000001a' -> '101'. Equivalent to
+# ch.split('-')[0].split('/')[1] (no match where that would IndexError).
+_CHANNEL_PEER_RE = re.compile(r'[^/-]*/([^/-]*)')
 
 
 def convert_channel_to_extension(dstchannel,channel):
-    try:
-        temp_ext = dstchannel.split('-')[0].split('/')[1]
-        if temp_ext.isdigit():
-            extension = temp_ext
-        else:
-            temp_ext = channel.split('-')[0].split('/')[1]
-            extension = temp_ext
-    except IndexError:
-        extension = None
-    return extension
+    m = _CHANNEL_PEER_RE.match(dstchannel or '')
+    if m is None:
+        return None
+    if m.group(1).isdigit():
+        return m.group(1)
+    m = _CHANNEL_PEER_RE.match(channel or '')
+    return m.group(1) if m else None
 
 # ---------------------------------------------------------------------------
 # Recording path resolution
@@ -218,22 +276,31 @@ _REC_MISS_REBUILD_INTERVAL = 15.0     # min seconds between miss-triggered rebui
 _REC_INDEX_LOCK = threading.Lock()
 
 
-def _recording_root() -> Path:
-    return Path(os.getenv('ASTERISK_RECORDING_ROOT_DIR', '/home/ibrahim/pyc/voip/'))
+# Resolved once at import; db_manager (imported above) has already run load_dotenv().
+_RECORDING_ROOT = Path(os.getenv('ASTERISK_RECORDING_ROOT_DIR', '/home/ibrahim/pyc/voip/'))
 
 
 def _build_recording_index() -> dict:
-    """Walk the recordings tree once and map each file's basename to its path."""
+    """Walk the recordings tree once and map each file's basename to its path.
+
+    Uses os.scandir directly: DirEntry.is_file()/is_dir() answer from the
+    d_type returned by readdir, so no per-file stat() is issued (Path.glob
+    plus is_file() stat'ed every entry)."""
     index: dict = {}
-    try:
-        for path in _recording_root().glob('**/*'):
-            if path.is_file():
-                # Last write wins if two dirs hold the same basename; recording
-                # filenames are unique in practice (they embed the uniqueid).
-                index[path.name] = path
-    except OSError:
-        # Recordings dir missing / unreadable — return whatever we have (maybe {}).
-        pass
+    stack = [str(_RECORDING_ROOT)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        # Last write wins if two dirs hold the same basename; recording
+                        # filenames are unique in practice (they embed the uniqueid).
+                        index[entry.name] = Path(entry.path)
+        except OSError:
+            # Recordings dir missing / unreadable — skip it and keep what we have.
+            continue
     return index
 
 
@@ -256,9 +323,8 @@ def _get_recording_index(force: bool = False) -> dict:
 def get_recording_path(file_wav):
     """Resolve a CDR recording filename to its on-disk Path via the cached index.
 
-    O(1) after the index is warm. Falls back to a throttled rebuild (so recently
-    finished calls are found) and finally a substring scan of the in-memory index
-    (no disk I/O) to preserve the old partial-match behaviour."""
+    O(1) after the index is warm. Falls back to a throttled rebuild so recently
+    finished calls are found. Matching is on the exact basename only."""
     if not file_wav:
         return None
     name = os.path.basename(str(file_wav))
@@ -273,16 +339,7 @@ def get_recording_path(file_wav):
     global _REC_INDEX_BUILT_AT
     if (time.monotonic() - _REC_INDEX_BUILT_AT) >= _REC_MISS_REBUILD_INTERVAL:
         index = _get_recording_index(force=True)
-        hit = index.get(name)
-        if hit is not None:
-            return hit
-
-    # Preserve the legacy substring semantics (recordingfile stored as a partial),
-    # but over the in-memory index only — no filesystem walk.
-    needle = str(file_wav)
-    for basename, path in index.items():
-        if needle in basename or needle in str(path):
-            return path
+        return index.get(name)
     return None
 
 
@@ -368,73 +425,103 @@ def crm_identity_from_cdr(linkedid: str) -> dict:
     return {k: v for k, v in out.items() if v not in (None, '')}
 
 
-def call_log(limit=None, date=None, date_from=None, date_to=None, allowed_extensions=None,
-             search=None, enrich=True):
-    """Build normalized call-history rows from the CDR.
+def iter_call_log(limit=None, date=None, date_from=None, date_to=None,
+                  allowed_extensions=None, search=None, recordings=False):
+    """Yield normalized call-history rows from the CDR one at a time.
 
-    enrich=True (Call History UI) resolves each row's recording path and flags
-    supervision (ChanSpy) legs. Analytics reuses this data source but only needs
-    direction/disposition/duration/talk, so it passes enrich=False to skip the
-    recording lookup and the supervision query — real savings when scanning a
-    whole period with no row limit.
+    The single-pass analytics scans consume this directly so a whole period is
+    never held twice (raw CDR rows + shaped rows). They never read recording
+    paths or supervision flags, so they leave recordings off and skip the
+    recording-index walk and the supervision query. recordings=True resolves
+    each row's recording path; supervision flags need the full page and are
+    added by call_log().
     """
+    # Streamed from an unbuffered cursor: rows are shaped as they arrive.
     call_log = get_call_log_from_db(limit=limit, date=date,
-                                     date_from=date_from, date_to=date_to,
-                                     allowed_extensions=allowed_extensions,
-                                     search=search)
+                                    date_from=date_from, date_to=date_to,
+                                    allowed_extensions=allowed_extensions,
+                                    search=search, stream=True)
     
-    result = []
-    for cdr in call_log:
-        cdr['call_type'] = classify_cdr_direction(cdr)
-        cdr['extension'] = convert_channel_to_extension(cdr['dstchannel'],cdr['channel'])        
-        if enrich and cdr.get('recordingfile'):
-            cdr['recording_path'] = get_recording_path(cdr['recordingfile'])
-        else:
-            cdr['recording_path'] = None
+    # Take the recording index once for the whole page; only misses go through
+    # get_recording_path's throttled-rebuild fallback.
+    rec_index = _get_recording_index() if recordings else {}
+
+    classify = _classify_cdr_fields
+    to_ext = convert_channel_to_extension
+    status_get = _STATUS_MAP.get
+    # Streamed rows are tuples in db_manager._CDR_FIELDS order; unpack each
+    # straight into locals instead of going through a per-row dict.
+    for (calldate, src, dst, dcontext, dstchannel, lastapp,
+         duration, talk, disposition, channel, recordingfile, customer_name,
+         uniqueid, linkedid, qos, call_journey_count, app) in call_log:
+        call_type = classify(src, dst, channel, dstchannel, dcontext, lastapp)
+        extension = to_ext(dstchannel, channel)
+
+        recording_path = None
+        if recordings and recordingfile:
+            recording_path = (rec_index.get(os.path.basename(str(recordingfile)))
+                              or get_recording_path(recordingfile))
         
         # Determine phone number (external party) based on call direction
-        call_type = cdr.get('call_type', '')
         if call_type == 'IN':
-            phone_number = cdr.get('src', '')
+            phone_number = src
         elif call_type == 'OUT':
-            phone_number = cdr.get('dst', '')
+            phone_number = dst
         else:
-            phone_number = cdr.get('dst', '') or cdr.get('src', '')
+            phone_number = dst or src
         
         # Canonical outcome. Computed on read from the CDR disposition, never stored,
         # so the whole history re-renders under this vocabulary with no backfill.
-        # `disposition` below stays the RAW CDR value — analytics keys off it.
-        disposition = str(cdr.get('disposition', '')).upper()
-        status = map_call_outcome(disposition=disposition,
-                                  answered=bool(cdr.get('billsec')))
+        # `disposition` below stays the RAW CDR value (upper-cased in SQL) —
+        # analytics keys off it. The outcome mapping stays here, not in a SQL CASE,
+        # so map_call_outcome remains the single definition of the vocabulary.
+        disposition = disposition or ''
+        answered = bool(talk)
+        status = status_get((disposition, answered)) or \
+            map_call_outcome(disposition=disposition, answered=answered)
 
         # Create a new dict with only the fields you want
         filtered_cdr = {
-            'calldate': cdr.get('calldate'),
-            'src': cdr.get('src'),
-            'dst': cdr.get('dst'),
+            'calldate': calldate,
+            'src': src,
+            'dst': dst,
             'phone_number': phone_number,
-            'customer_name': cdr.get('cnam') or None,
-            'duration': cdr.get('duration'),
-            'talk': cdr.get('billsec'),  # billsec renamed to talk
+            'customer_name': customer_name,
+            'duration': duration,
+            'talk': talk,
             'disposition': disposition,
             'status': status,
-            'QoS': cdr.get('userfield'),
-            'extension': cdr.get('extension'),
-            'call_type': cdr.get('call_type'),
-            'recording_path': str(cdr['recording_path']) if cdr.get('recording_path') else None,
-            'recording_file': cdr.get('recordingfile') or None,
-            'app': cdr.get('call_app'),  
-            'call_journey_count':cdr.get('call_journey_count'),
-            'linkedid':cdr.get('linkedid'),
-            'uniqueid':cdr.get('uniqueid'),
-            # Supervision (listen/whisper/barge). Enriched below; a standalone ChanSpy
+            'QoS': qos,
+            'extension': extension,
+            'call_type': call_type,
+            'recording_path': str(recording_path) if recording_path else None,
+            'recording_file': recordingfile or None,
+            'app': app,
+            'call_journey_count': call_journey_count,
+            'linkedid': linkedid,
+            'uniqueid': uniqueid,
+            # Supervision (listen/whisper/barge). Enriched by call_log(); a standalone ChanSpy
             # leg is flagged here so the UI can hide it behind a "supervision" filter.
             'is_supervision': False,
             'supervision': None,
         }
 
-        result.append(filtered_cdr)
+        yield filtered_cdr
+
+
+def call_log(limit=None, date=None, date_from=None, date_to=None, allowed_extensions=None,
+             search=None, enrich=True):
+    """Build normalized call-history rows from the CDR.
+
+    enrich=True (Call History UI) resolves each row's recording path and flags
+    supervision (ChanSpy) legs. Analytics reuses this data source but only needs
+    direction/disposition/duration/talk, so it passes enrich=False to skip the
+    recording lookup and the supervision query — real savings when scanning a
+    whole period with no row limit.
+    """
+    result = list(iter_call_log(limit=limit, date=date, date_from=date_from, date_to=date_to,
+                                allowed_extensions=allowed_extensions, search=search,
+                                recordings=enrich))
 
     # Flag ChanSpy legs (listen/whisper/barge) so the call log can hide them by default.
     # A supervision row is its own CDR call whose linkedid/uniqueid we recorded when the
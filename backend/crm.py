@@ -10,20 +10,88 @@ This connector sends call data to CRM systems in a standardized format.
 
 import asyncio
 import base64
+import functools
+import hashlib
 import ipaddress
 import json
 import logging
 import re
 import socket
+import time
 import urllib.parse
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Dict, List, Optional, Any, Union
-from datetime import datetime, timedelta
+from datetime import datetime
 import httpx
 
+try:  # orjson is optional; encodes call payloads several times faster than stdlib json
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # HTTP/2 support is an httpx extra; fall back to HTTP/1.1 keep-alive without it
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
 log = logging.getLogger(__name__)
 
+# Keep-alive pool for the per-connector client. Call-end pushes arrive in bursts
+# against a single CRM host, so idle connections are held long enough to be
+# reused by the next call instead of paying a fresh TCP/TLS handshake.
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+# Opt-in call batching (batch_mode=True): pushes arriving within one flush
+# window are coalesced into a single {"calls": [...]} POST.
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_BATCH_FLUSH_INTERVAL = 0.05  # seconds
+
+# OAuth2 access tokens are shared by every connector built from the same
+# credentials — the settings test endpoints construct a throwaway connector per
+# request, and each one would otherwise run its own client-credentials grant.
+# Keyed by a digest of (token_url, client_id, client_secret, scope), so a
+# connector built with a wrong or rotated secret never sees the live token and
+# has to run (and pass) its own grant. Values are
+# (token, expiry, refresh_at) on the time.monotonic() clock, so NTP steps
+# neither extend nor cut short a token's window. Past refresh_at the token is
+# still served while a background task fetches the next one.
+_OAUTH2_TOKEN_CACHE: Dict[str, tuple] = {}
+_OAUTH2_LOCKS: Dict[str, asyncio.Lock] = {}
+_OAUTH2_REFRESH_TASKS: Dict[str, asyncio.Task] = {}
+OAUTH2_EXPIRY_BUFFER = 300  # refresh 5 minutes before the IdP says the token dies
+OAUTH2_REFRESH_AHEAD = 300  # start a background refresh this long before that
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON body, via orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse a response body, via orjson when it's installed.
+
+    Both parsers raise a ValueError subclass on malformed input (orjson's
+    JSONDecodeError derives from json.JSONDecodeError).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_hms(total_seconds: int) -> str:
+    """Seconds -> "HH:MM:SS". Cached because call durations cluster tightly."""
+    minutes, seconds = divmod(total_seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
 
 class AuthType(Enum):
     """Supported authentication types."""
@@ -81,6 +149,10 @@ class CRMConnector:
             "call_type": "inbound"
         }
         await crm.send_call_data(call_data)
+    
+    A connector owns a pooled HTTP client; keep one per CRM configuration for
+    as long as that configuration is live and close() it when replaced, rather
+    than building one per request.
     """
     
     def __init__(
@@ -101,11 +173,20 @@ class CRMConnector:
         oauth2_token_url: Optional[str] = None,
         oauth2_scope: Optional[str] = None,
         oauth2_token: Optional[str] = None,  # Pre-obtained token
+        oauth2_min_cache_ttl: int = 120,  # Don't cache tokens shorter-lived than this
         # Common settings
         endpoint_path: str = "/api/calls",  # CRM endpoint path
         timeout: int = 30,
         verify_ssl: bool = True,
-        custom_headers: Optional[Dict[str, str]] = None
+        custom_headers: Optional[Dict[str, str]] = None,
+        # Connection pool
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        http2: bool = True,
+        # Batching
+        batch_mode: bool = False,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        batch_flush_interval: float = DEFAULT_BATCH_FLUSH_INTERVAL
     ):
         """
         Initialize CRM Connector.
@@ -123,18 +204,34 @@ class CRMConnector:
             oauth2_token_url: OAuth2 token endpoint URL
             oauth2_scope: OAuth2 scope (optional)
             oauth2_token: Pre-obtained OAuth2 token (optional, will fetch if not provided)
+            oauth2_min_cache_ttl: Tokens with expires_in below this many seconds are
+                used once and not cached
             endpoint_path: API endpoint path for sending call data
             timeout: Request timeout in seconds
             verify_ssl: Whether to verify SSL certificates
             custom_headers: Additional custom headers to include in requests
+            max_keepalive_connections: Idle connections kept open for reuse
+            max_connections: Upper bound on concurrent connections to the CRM
+            http2: Negotiate HTTP/2 when the h2 package is installed
+            batch_mode: Coalesce concurrent POSTs into one {"calls": [...]} request
+                (the CRM endpoint must accept that body)
+            max_batch_size: Most calls sent in one batched request
+            batch_flush_interval: Seconds to wait for more calls before flushing
         """
         # Normalize server URL (remove trailing slash)
         self.server_url = server_url.rstrip('/')
         self.auth_type = auth_type
         self.endpoint_path = endpoint_path
+        self._default_url = self.server_url + endpoint_path  # the push target for nearly every call
         self.timeout = timeout
         self.verify_ssl = verify_ssl
         self.custom_headers = custom_headers or {}
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        self._limits = httpx.Limits(
+            max_keepalive_connections=max_keepalive_connections,
+            max_connections=max_connections,
+            keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY
+        )
         
         # Auth credentials
         self.api_key = api_key
@@ -149,14 +246,45 @@ class CRMConnector:
         self.oauth2_token_url = oauth2_token_url
         self.oauth2_scope = oauth2_scope
         self._oauth2_token = oauth2_token
-        self._oauth2_token_expiry: Optional[datetime] = None
-        self._token_lock: Optional[asyncio.Lock] = None  # For thread-safe token refresh
+        self.oauth2_min_cache_ttl = oauth2_min_cache_ttl
+        self._oauth2_cache_key = hashlib.sha256(
+            f"{oauth2_token_url}|{oauth2_client_id}|{oauth2_client_secret}|{oauth2_scope}".encode()
+        ).hexdigest()
+        # The client-credentials grant body never changes; encode it once
+        oauth2_form = {
+            "grant_type": "client_credentials",
+            "client_id": oauth2_client_id,
+            "client_secret": oauth2_client_secret
+        }
+        if oauth2_scope:
+            oauth2_form["scope"] = oauth2_scope
+        self._oauth2_body = urllib.parse.urlencode(oauth2_form).encode()
+        # Bound once here: asyncio.Lock no longer ties itself to a loop at
+        # construction (3.10+), and resolving it up front means concurrent first
+        # calls can't each end up holding a different lock.
+        self._token_lock: Optional[asyncio.Lock] = (
+            _OAUTH2_LOCKS.setdefault(self._oauth2_cache_key, asyncio.Lock())
+            if auth_type == AuthType.OAUTH2 else None
+        )
         
-        # HTTP client
-        self._client: Optional[httpx.AsyncClient] = None
+        # Batching (queue and worker are created on first use, inside the loop)
+        self.batch_mode = batch_mode
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_flush_interval = batch_flush_interval
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        # Background OAuth2 refresh started by this connector; close() cancels it
+        self._refresh_task: Optional[asyncio.Task] = None
         
         # Validate auth configuration
         self._validate_auth_config()
+        
+        # Everything but an OAuth2 bearer is fixed for the connector's lifetime
+        self._static_headers = self._compute_static_headers()
+        
+        # HTTP client. Built up front (AsyncClient needs no running loop) and kept
+        # for the connector's lifetime so its keep-alive pool is actually reused.
+        self._client: Optional[httpx.AsyncClient] = self._new_client()
     
     def _validate_auth_config(self):
         """Validate that required credentials are provided for the selected auth type."""
@@ -178,86 +306,160 @@ class CRMConnector:
             if not self.oauth2_token_url and not self._oauth2_token:
                 raise ValueError("OAuth2 token_url is required if no pre-obtained token is provided")
     
+    def _new_client(self) -> httpx.AsyncClient:
+        """Build the pooled HTTP client."""
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            verify=self.verify_ssl,
+            limits=self._limits,
+            http2=self.http2
+        )
+    
     async def _get_client(self) -> httpx.AsyncClient:
-        """Get or create HTTP client, recreating if closed."""
-        if self._client is None or self._client.is_closed:
-            if self._client is not None:
-                try:
-                    await self._client.aclose()
-                except Exception:
-                    pass  # Ignore errors when closing
-            self._client = httpx.AsyncClient(
-                timeout=self.timeout,
-                verify=self.verify_ssl
-            )
-        return self._client
+        """Get the HTTP client, creating a fresh one only after close()."""
+        client = self._client
+        if client is None:
+            client = self._client = self._new_client()
+        return client
     
     async def _get_oauth2_token(self) -> str:
         """
         Get OAuth2 access token, refreshing if necessary.
-        Uses async lock to prevent race conditions during token refresh.
+        Tokens live in the module-level cache so every connector sharing these
+        credentials reuses one grant; the per-key lock serializes refreshes.
+        A token inside its refresh-ahead window is still returned immediately
+        while a background task fetches its replacement.
         
         Returns:
             Valid OAuth2 access token
         """
-        # Initialize lock if not exists
-        if self._token_lock is None:
-            self._token_lock = asyncio.Lock()
+        key = self._oauth2_cache_key
+        # Lock-free fast path for a valid cached token
+        cached = _OAUTH2_TOKEN_CACHE.get(key)
+        now = time.monotonic()
+        if cached and now < cached[1]:
+            if now >= cached[2]:
+                self._schedule_oauth2_refresh()
+            self._oauth2_token = cached[0]
+            return self._oauth2_token
         
         async with self._token_lock:
             # Double-check token validity after acquiring lock
-            if self._oauth2_token and self._oauth2_token_expiry:
-                if datetime.now() < self._oauth2_token_expiry:
-                    return self._oauth2_token
-            
-            # Fetch new token
-            if not self.oauth2_token_url:
-                raise ValueError("OAuth2 token URL is required to fetch token")
-            
-            client = await self._get_client()
+            cached = _OAUTH2_TOKEN_CACHE.get(key)
+            if cached and time.monotonic() < cached[1]:
+                self._oauth2_token = cached[0]
+                return self._oauth2_token
+            return await self._fetch_oauth2_token()
+    
+    def _schedule_oauth2_refresh(self):
+        """Start a background token refresh unless one is already running."""
+        task = _OAUTH2_REFRESH_TASKS.get(self._oauth2_cache_key)
+        if (task is not None and not task.done()) or self._token_lock.locked():
+            return
+        task = self._refresh_task = asyncio.create_task(self._background_refresh())
+        _OAUTH2_REFRESH_TASKS[self._oauth2_cache_key] = task
+    
+    async def _background_refresh(self):
+        """Replace a still-valid but ageing token; failures leave the current one in place."""
+        try:
+            async with self._token_lock:
+                cached = _OAUTH2_TOKEN_CACHE.get(self._oauth2_cache_key)
+                if cached and time.monotonic() < cached[2]:
+                    return  # someone else already refreshed it
+                await self._fetch_oauth2_token()
+        except Exception as e:
+            log.warning(f"Background OAuth2 token refresh failed: {type(e).__name__}")
+    
+    async def _fetch_oauth2_token(self) -> str:
+        """Run the client-credentials grant and cache the result. Call with _token_lock held."""
+        key = self._oauth2_cache_key
+        if not self.oauth2_token_url:
+            raise ValueError("OAuth2 token URL is required to fetch token")
+        
+        client = await self._get_client()
+        
+        try:
+            response = await client.post(
+                self.oauth2_token_url,
+                content=self._oauth2_body,
+                headers=_FORM_HEADERS
+            )
+            response.raise_for_status()
             
-            # Prepare OAuth2 token request
-            data = {
-                "grant_type": "client_credentials",
-                "client_id": self.oauth2_client_id,
-                "client_secret": self.oauth2_client_secret
-            }
+            token_data = _json_loads(response.content)
+            self._oauth2_token = token_data.get("access_token")
             
-            if self.oauth2_scope:
-                data["scope"] = self.oauth2_scope
+            if not self._oauth2_token:
+                raise ValueError("No access_token in OAuth2 response")
             
-            try:
-                response = await client.post(
-                    self.oauth2_token_url,
-                    data=data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
+            # Calculate token expiry (default to 1 hour if not provided)
+            expires_in = token_data.get("expires_in", 3600)
+            if expires_in < self.oauth2_min_cache_ttl:
+                # Too short-lived to be worth caching: it would likely expire
+                # mid-request and cost a 401 retry. Fetch fresh each time.
+                _OAUTH2_TOKEN_CACHE.pop(key, None)
+                log.debug(f"OAuth2 token expires in {expires_in}s - not caching")
+            else:
+                # Never let the safety buffer eat more than half the lifetime
+                now = time.monotonic()
+                usable = expires_in - min(OAUTH2_EXPIRY_BUFFER, expires_in // 2)
+                _OAUTH2_TOKEN_CACHE[key] = (
+                    self._oauth2_token,
+                    now + usable,
+                    now + usable - min(OAUTH2_REFRESH_AHEAD, usable // 2)
                 )
-                response.raise_for_status()
-                
-                token_data = response.json()
-                self._oauth2_token = token_data.get("access_token")
-                
-                # Calculate token expiry (default to 1 hour if not provided)
-                expires_in = token_data.get("expires_in", 3600)
-                self._oauth2_token_expiry = datetime.now() + timedelta(seconds=expires_in - 60)  # 60s buffer
-                
-                if not self._oauth2_token:
-                    raise ValueError("No access_token in OAuth2 response")
-                
-                return self._oauth2_token
             
-            except httpx.HTTPStatusError as e:
-                # Sanitize error logging - don't expose response body which may contain secrets
-                log.error(f"Failed to fetch OAuth2 token: HTTP {e.response.status_code}")
-                if log.isEnabledFor(logging.DEBUG):
-                    log.debug(f"OAuth2 token response body (truncated): {e.response.text[:200]}...")
-                raise
-            except httpx.HTTPError as e:
-                log.error(f"Failed to fetch OAuth2 token: {type(e).__name__}")
-                raise
+            return self._oauth2_token
+        
+        except httpx.HTTPStatusError as e:
+            # Sanitize error logging - don't expose response body which may contain secrets
+            log.error(f"Failed to fetch OAuth2 token: HTTP {e.response.status_code}")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"OAuth2 token response body (truncated): {e.response.text[:200]}...")
+            raise
+        except httpx.HTTPError as e:
+            log.error(f"Failed to fetch OAuth2 token: {type(e).__name__}")
+            raise
     
-    def _build_headers(self) -> Dict[str, str]:
-        """Build request headers based on authentication type."""
+    def _invalidate_oauth2_token(self, token: Optional[str]):
+        """Drop a token the CRM rejected, unless another caller already replaced it."""
+        cached = _OAUTH2_TOKEN_CACHE.get(self._oauth2_cache_key)
+        if cached and cached[0] == token:
+            del _OAUTH2_TOKEN_CACHE[self._oauth2_cache_key]
+        if self._oauth2_token == token:
+            self._oauth2_token = None
+    
+    async def _request_with_auth(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request, attaching the OAuth2 bearer when needed.
+        
+        A 401 on an OAuth2 connector usually means the token was revoked
+        server-side before its advertised expiry; evict it and retry once with a
+        freshly granted token rather than failing until the cache entry ages out.
+        """
+        if self.auth_type != AuthType.OAUTH2:
+            return await client.request(method=method, url=url, headers=headers, **kwargs)
+        
+        for attempt in range(2):
+            token = await self._get_oauth2_token()
+            headers["Authorization"] = f"Bearer {token}"
+            response = await client.request(method=method, url=url, headers=headers, **kwargs)
+            if response.status_code != 401 or attempt:
+                break
+            log.warning("CRM rejected OAuth2 token (HTTP 401) - refreshing and retrying once")
+            self._invalidate_oauth2_token(token)
+            await asyncio.sleep(0.1)
+        return response
+    
+    def _compute_static_headers(self) -> Dict[str, str]:
+        """Build the request headers that don't change between requests."""
         headers = {
             "Content-Type": "application/json",
             "User-Agent": "OpDesk-CRM-Connector/1.0"
@@ -284,6 +486,10 @@ class CRMConnector:
         
         return headers
     
+    def _build_headers(self) -> Dict[str, str]:
+        """Return a per-request copy of the static headers (callers add the OAuth2 bearer)."""
+        return dict(self._static_headers)
+    
     async def send_call_data(
         self,
         call_data: Dict[str, Any],
@@ -336,24 +542,102 @@ class CRMConnector:
             if missing:
                 raise ValueError(f"Missing required fields: {missing}")
 
+        if self.batch_mode and method == "POST":
+            return await self._enqueue_for_batch(call_data, endpoint_path or self.endpoint_path)
+
+        return await self._send_payload(call_data, endpoint_path, method)
+    
+    async def send_call_data_batch(
+        self,
+        calls: List[Dict[str, Any]],
+        endpoint_path: Optional[str] = None
+    ) -> Dict[str, Union[bool, int, str, Dict[str, Any], None]]:
+        """
+        Send several calls in one POST as {"calls": [...]}.
+        
+        Returns the same result dictionary as send_call_data, describing the
+        single batched request.
+        """
+        return await self._send_payload({"calls": calls}, endpoint_path, "POST")
+    
+    async def _enqueue_for_batch(
+        self,
+        call_data: Dict[str, Any],
+        endpoint_path: str
+    ) -> Dict[str, Union[bool, int, str, Dict[str, Any], None]]:
+        """Hand a call to the batch worker and wait for its batch's result."""
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_worker(self._batch_queue))
+        future = asyncio.get_running_loop().create_future()
+        self._batch_queue.put_nowait((endpoint_path, call_data, future))
+        return await future
+    
+    async def _batch_worker(self, queue: asyncio.Queue):
+        """
+        Drain the batch queue: take the first waiting call, collect whatever else
+        arrives within batch_flush_interval (up to max_batch_size), then send one
+        request per endpoint path and resolve every caller's future with it.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                batch.append(await queue.get())
+                deadline = loop.time() + self.batch_flush_interval
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                
+                by_path: Dict[str, list] = {}
+                for path, call_data, future in batch:
+                    by_path.setdefault(path, []).append((call_data, future))
+                
+                for path, items in by_path.items():
+                    try:
+                        result = await self.send_call_data_batch([c for c, _ in items], endpoint_path=path)
+                    except Exception as e:
+                        for _, future in items:
+                            if not future.done():
+                                future.set_exception(e)
+                        continue
+                    for _, future in items:
+                        if not future.done():
+                            future.set_result(result)
+            finally:
+                # close() cancels the worker mid-window or mid-POST; calls already
+                # taken off the queue must not leave their callers waiting forever.
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("CRM connector closed before the batch was sent"))
+    
+    async def _send_payload(
+        self,
+        payload: Dict[str, Any],
+        endpoint_path: Optional[str],
+        method: str
+    ) -> Dict[str, Union[bool, int, str, Dict[str, Any], None]]:
+        """Send one JSON request to the CRM and wrap the outcome in a result dict."""
         client = await self._get_client()
-        url = f"{self.server_url}{endpoint_path or self.endpoint_path}"
+        url = self.server_url + endpoint_path if endpoint_path else self._default_url
         
         # Build headers
         headers = self._build_headers()
         
-        # Handle OAuth2 token
-        if self.auth_type == AuthType.OAUTH2:
-            token = await self._get_oauth2_token()
-            headers["Authorization"] = f"Bearer {token}"
-        
         try:
-            # Send request
-            response = await client.request(
-                method=method,
-                url=url,
-                json=call_data,
-                headers=headers
+            # Send request (OAuth2 bearer attached, one retry on 401). The body is
+            # pre-encoded; Content-Type: application/json comes from the static headers.
+            response = await self._request_with_auth(
+                client,
+                method,
+                url,
+                headers,
+                content=_json_dumps(payload)
             )
             
             # Raise exception for HTTP errors
@@ -361,8 +645,8 @@ class CRMConnector:
             
             # Try to parse JSON response
             try:
-                response_data = response.json()
-            except json.JSONDecodeError:
+                response_data = _json_loads(response.content)
+            except ValueError:
                 response_data = {"message": response.text, "status_code": response.status_code}
             
             log.info(f"Successfully sent call data to CRM: {url}")
@@ -418,17 +702,13 @@ class CRMConnector:
         headers = self._build_headers()
         headers.pop("Content-Type", None)
 
-        if self.auth_type == AuthType.OAUTH2:
-            token = await self._get_oauth2_token()
-            headers["Authorization"] = f"Bearer {token}"
-
         try:
-            response = await client.request(method="GET", url=url, headers=headers)
+            response = await self._request_with_auth(client, "GET", url, headers)
             response.raise_for_status()
 
             try:
-                response_data = response.json()
-            except json.JSONDecodeError:
+                response_data = _json_loads(response.content)
+            except ValueError:
                 response_data = {"message": response.text, "status_code": response.status_code}
 
             return {
@@ -474,12 +754,10 @@ class CRMConnector:
         Returns:
             Dictionary with connection test results
         """
-        test_endpoint = endpoint_path or self.endpoint_path
-        
         # Try HEAD request first (lighter weight, doesn't require body)
         try:
             client = await self._get_client()
-            url = f"{self.server_url}{test_endpoint}"
+            url = self.server_url + endpoint_path if endpoint_path else self._default_url
             headers = self._build_headers()
             
             # Handle OAuth2 token
@@ -529,6 +807,31 @@ class CRMConnector:
     
     async def close(self):
         """Close HTTP client and cleanup resources."""
+        # A refresh still running here would open a new client on this closed
+        # connector via _get_client() and nothing would ever close it.
+        if self._refresh_task is not None:
+            task, self._refresh_task = self._refresh_task, None
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            if _OAUTH2_REFRESH_TASKS.get(self._oauth2_cache_key) is task:
+                del _OAUTH2_REFRESH_TASKS[self._oauth2_cache_key]
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+            # Anything still queued never reached the CRM
+            while self._batch_queue is not None and not self._batch_queue.empty():
+                _, _, future = self._batch_queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("CRM connector closed before the batch was sent"))
+            self._batch_queue = None
         if self._client:
             await self._client.aclose()
             self._client = None
@@ -558,25 +861,19 @@ class CRMConnector:
             normalize_duration("323")  # Returns "00:05:23"
         """
         if isinstance(duration, int):
-            total_seconds = duration
+            return _format_hms(duration)
         elif isinstance(duration, str):
             # Check if already in HH:MM:SS format
             if ":" in duration:
                 return duration
             # Try to parse as integer seconds
             try:
-                total_seconds = int(duration)
+                return _format_hms(int(duration))
             except ValueError:
                 # Return as-is if can't parse
                 return duration
         else:
             return str(duration)
-        
-        # Convert seconds to HH:MM:SS
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
     
     @staticmethod
     def duration_to_seconds(duration: Union[int, str, None]) -> Optional[int]:
@@ -707,6 +1004,10 @@ def create_crm_connector(config: Dict[str, Any]) -> CRMConnector:
             - timeout: Request timeout (optional, default: 30)
             - verify_ssl: Verify SSL certificates (optional, default: True)
             - custom_headers: Custom headers dict (optional)
+            - max_keepalive_connections: Idle pooled connections (optional, default: 20)
+            - max_connections: Max concurrent connections (optional, default: 100)
+            - http2: Negotiate HTTP/2 when available (optional, default: True)
+            - batch_mode: Coalesce pushes into {"calls": [...]} POSTs (optional, default: False)
     
     Returns:
         Configured CRMConnector instance
@@ -741,7 +1042,11 @@ def create_crm_connector(config: Dict[str, Any]) -> CRMConnector:
         "endpoint_path": config.get("endpoint_path", "/api/calls"),
         "timeout": config.get("timeout", 30),
         "verify_ssl": config.get("verify_ssl", True),
-        "custom_headers": config.get("custom_headers")
+        "custom_headers": config.get("custom_headers"),
+        "max_keepalive_connections": config.get("max_keepalive_connections", DEFAULT_MAX_KEEPALIVE_CONNECTIONS),
+        "max_connections": config.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+        "http2": config.get("http2", True),
+        "batch_mode": config.get("batch_mode", False)
     }
     
     # Extract auth-specific parameters
@@ -6,11 +6,17 @@ Configuration (via .env):
     DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
 """
 
+import functools
 import hashlib
 import json
 import logging
 import os
 import secrets
+import threading
+import time
+from contextlib import contextmanager
+from types import MappingProxyType
+from datetime import date as _date
 from typing import Any, Dict, Optional, List, Tuple
 from dotenv import load_dotenv
 
@@ -25,24 +31,94 @@ log = logging.getLogger(__name__)
 
 try:
     import mysql.connector
-    from mysql.connector import Error
+    from mysql.connector import Error, pooling
+    from mysql.connector.errors import PoolError
 except ImportError:
     log.error("❌ mysql-connector-python not installed.")
     log.error("   Run: pip install mysql-connector-python")
     exit(1)
 
 
+@functools.lru_cache(maxsize=8)
 def get_db_config(password,database):
-    """Get database configuration from environment variables."""
-    return {
+    """Get database configuration from environment variables.
+
+    Memoized per (password, database): the environment is fixed after startup.
+    The mapping is shared and read-only — copy() it to modify (see
+    check_database_exists)."""
+    return MappingProxyType({
         'host': os.getenv('DB_HOST', 'localhost'),
         'port': int(os.getenv('DB_PORT', '3306')),
         'user': os.getenv('DB_USER', 'root'),
         'password':password,
         'database': database
-    }
+    })
+
+
+# The three databases every helper below talks to, resolved once at import
+# (load_dotenv() has run) instead of two os.getenv() calls + a cache lookup per query.
+_OPDESK_DB_CONFIG = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+_PBX_DB_CONFIG = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_NAME', 'asterisk'))
+_CDR_DB_CONFIG = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_CDR', ''))
+
+
+# One small connection pool per database, created on first use. Pooled
+# connections go back to the pool on close(), so _safe_close() works unchanged.
+# The pool keeps its default pool_reset_session=True: most readers here never
+# commit, and resetting on return ends their transaction so the next borrower
+# doesn't inherit a stale REPEATABLE READ snapshot.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+_pools: Dict[tuple, Any] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_connection(config: dict):
+    """Check a connection out of the pool for this config's database.
+
+    Falls back to a plain connection when every pooled connection is in use,
+    so a burst of callers degrades to the old connect-per-call behaviour
+    instead of failing.
+    """
+    key = (config['host'], config['port'], config['user'], config['database'])
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"opdesk-{len(_pools)}",
+                    pool_size=DB_POOL_SIZE,
+                    **config
+                )
+                _pools[key] = pool
+    try:
+        return pool.get_connection()
+    except PoolError:
+        return mysql.connector.connect(**config)
+
+
+
+# Extensions change only when the PBX is reconfigured; a successful read is
+# reused for EXTENSIONS_CACHE_TTL seconds. Failed reads (None) are never cached.
+EXTENSIONS_CACHE_TTL = 60.0
+_extensions_cache: Optional[Tuple[float, List[str]]] = None
+# Extension/queue display names come from the same PBX tables and are read on
+# most settings/agent requests; they share the TTL and the invalidation.
+_extension_names_cache: Optional[Tuple[float, Dict[str, str]]] = None
+_queue_names_cache: Optional[Tuple[float, Dict[str, str]]] = None
+# Set once the PBX reports there is no FreePBX `users` table (plain Asterisk /
+# PJSIP installs), so later reads go straight to ps_endpoints in one query.
+_users_table_missing = False
 
 
+def invalidate_extensions_cache() -> None:
+    """Force the next get_extensions_from_db() / get_extension_names_from_db() /
+    get_queue_names_from_db() call to re-read the PBX."""
+    global _extensions_cache, _extension_names_cache, _queue_names_cache
+    _extensions_cache = None
+    _extension_names_cache = None
+    _queue_names_cache = None
+
 
 def get_extensions_from_db():
     """Get list of extension numbers from the PBX database.
@@ -50,32 +126,48 @@ def get_extensions_from_db():
     Returns a list on success (possibly empty when the PBX genuinely has no
     extensions), or ``None`` when the DB could not be read at all. Callers use the
     None-vs-[] distinction to avoid pruning local state on a transient read failure.
+    Successful reads are cached for EXTENSIONS_CACHE_TTL seconds.
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_NAME', 'asterisk'))
+    global _extensions_cache, _users_table_missing
+    cached = _extensions_cache
+    if cached is not None and time.monotonic() - cached[0] < EXTENSIONS_CACHE_TTL:
+        return list(cached[1])
+
+    config = _PBX_DB_CONFIG
     extensions = []
     read_ok = False
     conn = None
     cursor = None
 
     try:
-        conn = mysql.connector.connect(**config)
-        cursor = conn.cursor(dictionary=True)
+        conn = _get_connection(config)
+        # Single-column reads: a plain tuple cursor skips the per-row dict
+        cursor = conn.cursor()
 
         # Try FreePBX users table first
-        try:
-            cursor.execute("SELECT extension FROM users ORDER BY extension")
-            users = cursor.fetchall()
-            extensions = [str(u['extension']) for u in users if u['extension']]
-            read_ok = True
-        except Error:
-            pass
+        if not _users_table_missing:
+            try:
+                # Blank/NULL rows are dropped server-side rather than shipped and skipped
+                cursor.execute(
+                    "SELECT extension FROM users "
+                    "WHERE extension IS NOT NULL AND extension <> '' ORDER BY extension"
+                )
+                extensions = [str(r[0]) for r in cursor]
+                read_ok = True
+            except Error as e:
+                if getattr(e, 'errno', None) == 1146:  # ER_NO_SUCH_TABLE
+                    _users_table_missing = True
 
         # If no extensions found, try PJSIP endpoints
         if not extensions:
             try:
-                cursor.execute("SELECT id FROM ps_endpoints WHERE id REGEXP '^[0-9]+$' ORDER BY CAST(id AS UNSIGNED)")
-                endpoints = cursor.fetchall()
-                extensions = [str(e['id']) for e in endpoints if e['id']]
+                # Numeric-ID filter and ordering done here rather than with a
+                # per-row REGEXP + CAST in MySQL; trunks are simply skipped.
+                cursor.execute("SELECT id FROM ps_endpoints")
+                extensions = sorted(
+                    (i for i in (str(r[0]) for r in cursor if r[0]) if i.isascii() and i.isdigit()),
+                    key=int
+                )
                 read_ok = True
             except Error:
                 pass
@@ -88,27 +180,36 @@ def get_extensions_from_db():
     # Neither source query succeeded → signal a read failure, not an empty PBX.
     if not read_ok:
         return None
-    return extensions
+    _extensions_cache = (time.monotonic(), extensions)
+    return list(extensions)
 
 def get_extension_names_from_db() -> dict:
-    """Get extension names mapping (extension -> name) from the database."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_NAME', 'asterisk'))
+    """Get extension names mapping (extension -> name) from the database.
+
+    Cached for EXTENSIONS_CACHE_TTL seconds; a failed connection is not cached."""
+    global _extension_names_cache
+    cached = _extension_names_cache
+    if cached is not None and time.monotonic() - cached[0] < EXTENSIONS_CACHE_TTL:
+        return dict(cached[1])
+
+    config = _PBX_DB_CONFIG
     extension_names = {}
 
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
-        cursor = conn.cursor(dictionary=True)
+        conn = _get_connection(config)
+        # Two-column reads: tuple rows unpack straight into the mapping
+        cursor = conn.cursor()
 
-        # Try FreePBX users table first (name field)
+        # Try FreePBX users table first (name field). Unnamed/blank rows are
+        # filtered server-side, and a dict needs no ORDER BY (no filesort).
         try:
-            cursor.execute("SELECT extension, name FROM users WHERE extension IS NOT NULL ORDER BY extension")
-            users = cursor.fetchall()
-            for u in users:
-                if u['extension']:
-                    ext = str(u['extension'])
-                    name = u.get('name', '') or ''
-                    if name:
-                        extension_names[ext] = name
+            cursor.execute(
+                "SELECT extension, name FROM users "
+                "WHERE extension IS NOT NULL AND extension <> '' AND name IS NOT NULL AND name <> ''"
+            )
+            extension_names = {str(ext): name for ext, name in cursor}
         except Error as e:
             log.debug(f"Could not get names from users table: {e}")
 
@@ -116,63 +217,79 @@ def get_extension_names_from_db() -> dict:
         # (per-extension fallback, not all-or-nothing — so a partial users.name
         # table still gets topped up from ps_endpoints.description).
         try:
-            cursor.execute("SELECT id, description FROM ps_endpoints WHERE id REGEXP '^[0-9]+$' ORDER BY CAST(id AS UNSIGNED)")
-            endpoints = cursor.fetchall()
-            for e in endpoints:
-                if e['id']:
-                    ext = str(e['id'])
-                    name = e.get('description', '') or ''
-                    if name and ext not in extension_names:
-                        extension_names[ext] = name
+            # Same numeric-ID filter as get_extensions_from_db, in Python rather
+            # than a per-row REGEXP in MySQL; endpoints without a description
+            # are dropped server-side.
+            cursor.execute(
+                "SELECT id, description FROM ps_endpoints "
+                "WHERE description IS NOT NULL AND description <> ''"
+            )
+            for ep_id, description in cursor:
+                ext = str(ep_id or '')
+                if ext.isascii() and ext.isdigit() and ext not in extension_names:
+                    extension_names[ext] = description
         except Error as e:
             log.debug(f"Could not get names from ps_endpoints table: {e}")
 
-        cursor.close()
-        conn.close()
+        _extension_names_cache = (time.monotonic(), extension_names)
+        return dict(extension_names)
 
     except Error as e:
         log.warning(f"⚠️  Database error getting extension names: {e}")
+    finally:
+        _safe_close(cursor, conn)
 
     return extension_names
 
 def get_queue_names_from_db() -> dict:
-    """Get queue names mapping (queue -> name) from the database."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_NAME', 'asterisk'))
+    """Get queue names mapping (queue -> name) from the database.
+
+    Cached for EXTENSIONS_CACHE_TTL seconds; a failed connection is not cached."""
+    global _queue_names_cache
+    cached = _queue_names_cache
+    if cached is not None and time.monotonic() - cached[0] < EXTENSIONS_CACHE_TTL:
+        return dict(cached[1])
+
+    config = _PBX_DB_CONFIG
     queue_names = {}
 
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
-        cursor = conn.cursor(dictionary=True)
+        conn = _get_connection(config)
+        cursor = conn.cursor()
 
-        # Try FreePBX users table first (name field)
+        # FreePBX queues_config (descr field); blank rows filtered server-side,
+        # no ORDER BY since the result is a dict.
         try:
-            cursor.execute("SELECT extension, descr FROM queues_config WHERE extension IS NOT NULL ORDER BY extension")
-            users = cursor.fetchall()
-            for u in users:
-                if u['extension']:
-                    ext = str(u['extension'])
-                    name = u.get('descr', '') or ''
-                    if name:
-                        queue_names[ext] = name
+            cursor.execute(
+                "SELECT extension, descr FROM queues_config "
+                "WHERE extension IS NOT NULL AND extension <> '' AND descr IS NOT NULL AND descr <> ''"
+            )
+            queue_names = {str(ext): descr for ext, descr in cursor}
         except Error as e:
             log.debug(f"Could not get names from users table: {e}")
 
-        cursor.close()
-        conn.close()
+        _queue_names_cache = (time.monotonic(), queue_names)
+        return dict(queue_names)
 
     except Error as e:
         log.warning(f"⚠️  Database error getting extension names: {e}")
+    finally:
+        _safe_close(cursor, conn)
 
     return queue_names
 
 
 def get_extension_secret_from_db(extension):
     """Get extension secret from the database."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_NAME', 'asterisk'))
+    config = _PBX_DB_CONFIG
     secret = None
 
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
 
         try:
@@ -182,20 +299,21 @@ def get_extension_secret_from_db(extension):
         except Error as e:
             log.debug(f"Could not get extension secret from database: {e}")
 
-        cursor.close()
-        conn.close()
-
     except Error as e:
         log.warning(f"⚠️  Database error getting extension secret: {e}")
+    finally:
+        _safe_close(cursor, conn)
 
     return secret
 
 
 def _upsert_sip_keyword(extension: str, keyword: str, value: str) -> bool:
     """Insert or update a keyword row in the Asterisk sip table for an extension."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_NAME', 'asterisk'))
+    config = _PBX_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE sip SET data = %s WHERE id = %s AND keyword = %s",
@@ -207,12 +325,12 @@ def _upsert_sip_keyword(extension: str, keyword: str, value: str) -> bool:
                 (extension, keyword, value),
             )
         conn.commit()
-        cursor.close()
-        conn.close()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error _upsert_sip_keyword ({keyword}): {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def set_extension_secret_in_pbx(extension: str, secret: str) -> bool:
@@ -227,30 +345,36 @@ def set_extension_username_in_pbx(extension: str, username: str) -> bool:
 
 def set_extension_name_in_pbx(extension: str, name: str) -> bool:
     """Update the display name for an extension in the Asterisk users table."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_NAME', 'asterisk'))
+    config = _PBX_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE users SET name = %s WHERE extension = %s",
             (name, extension),
         )
         conn.commit()
-        cursor.close()
-        conn.close()
+        # The TTL-cached extension names would keep serving the old display name
+        invalidate_extensions_cache()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error set_extension_name_in_pbx: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_extensions_with_webrtc_from_users() -> list:
     """Only source for listing extensions in WebRTC tab. OpDesk users with an extension; unique by extension. Returns [{ extension, name, webrtc }, ...]."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     seen = set()
     out = []
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT extension, name, COALESCE(webrtc, 'no') AS webrtc FROM users WHERE extension IS NOT NULL AND extension != '' ORDER BY extension"
@@ -268,10 +392,10 @@ def get_extensions_with_webrtc_from_users() -> list:
                 'name': (row.get('name') or '').strip() or ext,
                 'webrtc': (row.get('webrtc') or 'no').strip().lower(),
             })
-        cursor.close()
-        conn.close()
     except Error as e:
         log.warning(f"get_extensions_with_webrtc_from_users: {e}")
+    finally:
+        _safe_close(cursor, conn)
     return out
 
 
@@ -289,25 +413,27 @@ def set_extension_webrtc(extension: str, enabled: bool, PBX: str) -> bool:
     is_issabel = (PBX or '').strip().lower() == 'issabel'
 
     # Enable/disable: OpDesk users.webrtc only
-    opdesk_config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    opdesk_config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**opdesk_config)
+        conn = _get_connection(opdesk_config)
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET webrtc = %s WHERE extension = %s", (webrtc_val, ext))
         if cursor.rowcount == 0:
-            cursor.close()
-            conn.close()
             return False  # Extension not in users (same as list; no duplicate path)
         conn.commit()
-        cursor.close()
-        conn.close()
     except Error as err:
         log.warning(f"set_extension_webrtc users ({ext}): {err}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_NAME', 'asterisk'))
+    config = _PBX_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         updated = 0
 
@@ -380,23 +506,23 @@ def set_extension_webrtc(extension: str, enabled: bool, PBX: str) -> bool:
                 log.info(f"Updated WebRTC for extension {ext}: users.webrtc={webrtc_val}, rtcp_mux={r}, avpf={a}, icesupport={i}, media_encryption={e}")
 
         conn.commit()
-        cursor.close()
-        conn.close()
         if updated and reload_asterisk_sip:
             reload_asterisk_sip(PBX)
         return True
     except Error as err:
         log.warning(f"set_extension_webrtc sip/certman ({ext}): {err}")
         return True  # users.webrtc was set
+    finally:
+        _safe_close(cursor, conn)
 
 def get_cdr_by_linkedid(linkedid):
     """
     Fetch CDR rows for a given linkedid. Returns list of dicts or [] on error.
     """
     conn = None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_CDR', ''))
+    config = _CDR_DB_CONFIG
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         # `sequence` orders the legs (origin -> final); uniqueid/linkedid identify
         # them. crm_identity_from_cdr collapses multi-leg calls using sequence, so
@@ -417,10 +543,193 @@ def get_cdr_by_linkedid(linkedid):
             cursor.close()
             conn.close()
 
+# Column order of the call-log SELECT below; streamed rows are plain tuples in
+# this order. (last_leg.channel used to be selected as a second `channel` that
+# the dict cursor silently overwrote with first_leg.channel, so it is gone, as
+# is last_leg.dst AS answered_by, which no caller read.)
+_CDR_FIELDS = (
+    'calldate', 'src', 'dst', 'dcontext', 'dstchannel',
+    'lastapp', 'duration', 'talk', 'disposition', 'channel', 'recordingfile',
+    'customer_name', 'uniqueid', 'linkedid', 'QoS', 'call_journey_count', 'app',
+)
+
+
+def _parse_date_param(value, name: str):
+    """Turn a 'YYYY-MM-DD' filter into a datetime.date (None/'' pass through).
+
+    Bad input is rejected here, before a connection is taken, and every textual
+    spelling of a day binds as the same DATE parameter."""
+    if not value or isinstance(value, _date):
+        return value or None
+    try:
+        return _date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format") from None
+
+
+def _call_log_query(limit, date, date_from, date_to, allowed_extensions, search) -> Tuple[str, tuple]:
+    """Build the get_call_log_from_db SQL and its parameters (raises ValueError on a bad limit or date)."""
+    date = _parse_date_param(date, 'date')
+    date_from = _parse_date_param(date_from, 'date_from')
+    date_to = _parse_date_param(date_to, 'date_to')
+    # Push the date window INTO the GROUP BY linkedid subquery so it scans
+    # only the relevant slice of `cdr` (using an index on calldate) instead of
+    # grouping the entire table and filtering afterwards. A 2-day
+    # upper buffer keeps legs of calls that span midnight; the outer WHERE
+    # below still applies the precise 1-day-granular bound. No date filter (a
+    # CRM uniqueid search reaching all history) → no pushdown, as before.
+    sub_conds: list = []
+    sub_params: list = []
+    # Window for the agent-leg scan below: same upper buffer, but the lower
+    # bound reaches one day further back (see the allowed_extensions comment).
+    leg_conds: list = []
+    leg_params: list = []
+    if date:
+        sub_conds.append("calldate >= %s AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
+        sub_params.extend([date, date])
+        leg_conds.append("calldate >= DATE_SUB(%s, INTERVAL 1 DAY) AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
+        leg_params.extend([date, date])
+    else:
+        if date_from:
+            sub_conds.append("calldate >= %s")
+            sub_params.append(date_from)
+            leg_conds.append("calldate >= DATE_SUB(%s, INTERVAL 1 DAY)")
+            leg_params.append(date_from)
+        if date_to:
+            sub_conds.append("calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
+            sub_params.append(date_to)
+            leg_conds.append("calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
+            leg_params.append(date_to)
+    sub_where = ("WHERE " + " AND ".join(sub_conds)) if sub_conds else ""
+
+    # Build the base query: first leg (min sequence) + last leg (max sequence) per linkedid,
+    # with call_app derived from dcontext (queue/ivr/direct) and leg count for call journey.
+    query = """
+        SELECT
+            first_leg.calldate,
+            first_leg.src,
+            first_leg.dst          AS dst,
+            first_leg.dcontext     AS dcontext,
+            last_leg.dstchannel    AS dstchannel,
+            last_leg.lastapp,
+            last_leg.duration,
+            last_leg.billsec       AS talk,
+            UPPER(last_leg.disposition) AS disposition,
+            first_leg.channel,
+            first_leg.recordingfile,
+            NULLIF(first_leg.cnam, '') AS customer_name,
+            first_leg.uniqueid,
+            first_leg.linkedid,
+            last_leg.userfield     AS QoS,
+            leg_count.total_legs AS call_journey_count,
+            CASE
+                WHEN first_leg.dcontext LIKE '%queue%' THEN 'queue'
+                WHEN first_leg.dcontext LIKE '%ivr%'   THEN 'ivr'
+                ELSE 'direct'
+            END AS app
+        FROM
+            (
+                -- One grouped pass yields both leg boundaries and the leg
+                -- count (previously three separate GROUP BY scans of cdr).
+                -- ROW_NUMBER() would avoid the self-joins but needs MySQL 8 /
+                -- MariaDB 10.2, and OpDesk still runs against MariaDB 5.5.
+                SELECT linkedid,
+                       MIN(sequence) AS min_seq,
+                       MAX(sequence) AS max_seq,
+                       COUNT(*)      AS total_legs
+                FROM cdr
+                {sub_where}
+                GROUP BY linkedid
+            ) leg_count
+        JOIN cdr first_leg
+            ON first_leg.linkedid = leg_count.linkedid AND first_leg.sequence = leg_count.min_seq
+        JOIN cdr last_leg
+            ON last_leg.linkedid = leg_count.linkedid AND last_leg.sequence = leg_count.max_seq
+    """.format(sub_where=sub_where)
+
+    # Build WHERE conditions (use first_leg for calldate/src, last_leg for dstchannel).
+    # The GROUP BY subquery's date params come first, then these outer params.
+    conditions = []
+    params = list(sub_params)
+
+    # Precise outer date bound. Compared against the bare column (no DATE()
+    # wrapper) so an index on calldate is usable; range form is equivalent to
+    # the old DATE()-based equality/inclusive-range comparisons.
+    if date:
+        conditions.append("first_leg.calldate >= %s AND first_leg.calldate < DATE_ADD(%s, INTERVAL 1 DAY)")
+        params.extend([date, date])
+    if date_from:
+        conditions.append("first_leg.calldate >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append("first_leg.calldate < DATE_ADD(%s, INTERVAL 1 DAY)")
+        params.append(date_to)
+    # Filter by agent extension.
+    # The agent's extension lives in a DIFFERENT place per direction: on an
+    # OUTBOUND call it is the origin `channel` (dstchannel is the trunk, src is
+    # the outbound caller-ID), on an INBOUND/queue call it is the `dstchannel`,
+    # and it is rarely first_leg.src. It is also usually on an intermediate leg
+    # (queue answer / transfer), not the first or last. Checking only
+    # first_leg.src + last_leg.dstchannel therefore dropped most agent calls,
+    # which is what made the agent/supervisor Dashboard tiles read low or zero.
+    # Scan all legs and collapse via linkedid so any matching leg surfaces the
+    # one call-log row (kept identical to get_call_log_count_from_db).
+    # The per-row SUBSTRING_INDEX match can't use an index, so the leg scan is
+    # bounded by a calldate window too. Its lower bound is a day earlier than
+    # the GROUP BY subquery's: that subquery only sees in-window legs, so a
+    # call straddling date_from midnight stays in the result (its first
+    # in-window leg becomes first_leg), and the agent's leg may be the one
+    # before midnight.
+    if allowed_extensions is not None:
+        if not allowed_extensions:
+            conditions.append("1 = 0")
+        else:
+            placeholders = ", ".join(["%s"] * len(allowed_extensions))
+            window = (" AND ".join(leg_conds) + " AND ") if leg_conds else ""
+            conditions.append(
+                "first_leg.linkedid IN ("
+                "SELECT linkedid FROM cdr WHERE " + window + "("
+                "SUBSTRING_INDEX(SUBSTRING_INDEX(dstchannel, '-', 1), '/', -1) IN (" + placeholders + ") "
+                "OR SUBSTRING_INDEX(SUBSTRING_INDEX(channel, '-', 1), '/', -1) IN (" + placeholders + ") "
+                "OR src IN (" + placeholders + ")"
+                "))"
+            )
+            params.extend(leg_params)
+            params.extend(allowed_extensions)
+            params.extend(allowed_extensions)
+            params.extend(allowed_extensions)
+
+    # Free-text search across caller/destination and call ids (whole-history search).
+    if search:
+        like = f"%{search.strip()}%"
+        conditions.append(
+            "("
+            "first_leg.src LIKE %s OR first_leg.dst LIKE %s OR last_leg.dst LIKE %s "
+            "OR first_leg.uniqueid LIKE %s OR first_leg.linkedid LIKE %s"
+            ")"
+        )
+        params.extend([like, like, like, like, like])
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    # Add ordering by calldate (most recent first)
+    query += " ORDER BY first_leg.calldate DESC"
+    
+    # Add limit if provided (validate it's a positive integer)
+    if limit:
+        if not isinstance(limit, int) or limit <= 0:
+            raise ValueError("limit must be a positive integer")
+        query += " LIMIT %s"
+        params.append(limit)
+
+    return query, tuple(params)
+
+
 def get_call_log_from_db(limit: int = None, date: str = None,
                          date_from: str = None, date_to: str = None,
                          allowed_extensions: Optional[List[str]] = None,
-                         search: str = None) -> list:
+                         search: str = None, stream: bool = False):
     """
     Get call log data from the database.
     
@@ -430,176 +739,76 @@ def get_call_log_from_db(limit: int = None, date: str = None,
         date_from: Filter from this date inclusive, format 'YYYY-MM-DD' (optional)
         date_to: Filter up to this date inclusive, format 'YYYY-MM-DD' (optional)
         allowed_extensions: If set, only return calls where destination agent (from dstchannel) is in this list.
+        stream: Return a generator that streams rows from an unbuffered cursor instead
+            of a list; the connection is held until it is exhausted or closed.
+            Streamed rows are tuples in _CDR_FIELDS order (no per-row dict).
     
     Returns:
-        List of CDR records as dictionaries
+        List of CDR records as dictionaries, already shaped for the call history:
+        billsec is returned as `talk`, userfield as `QoS`, cnam as `customer_name`
+        (NULL when blank), the dcontext-derived route as `app`, and disposition
+        upper-cased.
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_CDR', ''))
+    config = _CDR_DB_CONFIG
+    query, params = _call_log_query(limit, date, date_from, date_to, allowed_extensions, search)
+    if stream:
+        return _stream_call_log(config, query, params)
     data = []
 
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
 
-        # Push the date window INTO each GROUP BY linkedid subquery so they scan
-        # only the relevant slice of `cdr` (using an index on calldate) instead of
-        # grouping the entire table three times and filtering afterwards. A 2-day
-        # upper buffer keeps legs of calls that span midnight; the outer WHERE
-        # below still applies the precise 1-day-granular bound. No date filter (a
-        # CRM uniqueid search reaching all history) → no pushdown, as before.
-        sub_conds: list = []
-        sub_params: list = []
-        if date:
-            sub_conds.append("calldate >= %s AND calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
-            sub_params.extend([date, date])
-        else:
-            if date_from:
-                sub_conds.append("calldate >= %s")
-                sub_params.append(date_from)
-            if date_to:
-                sub_conds.append("calldate < DATE_ADD(%s, INTERVAL 2 DAY)")
-                sub_params.append(date_to)
-        sub_where = ("WHERE " + " AND ".join(sub_conds)) if sub_conds else ""
-
-        # Build the base query: first leg (min sequence) + last leg (max sequence) per linkedid,
-        # with call_app derived from dcontext (queue/ivr/direct) and leg count for call journey.
-        query = """
-            SELECT
-                first_leg.calldate,
-                first_leg.src,
-                first_leg.dst          AS dst,
-                first_leg.dcontext     AS dcontext,
-                last_leg.dst           AS answered_by,
-                last_leg.channel      AS channel,
-                last_leg.dstchannel    AS dstchannel,
-                last_leg.lastapp,
-                last_leg.duration,
-                last_leg.billsec,
-                last_leg.disposition,
-                first_leg.channel,
-                first_leg.recordingfile,
-                first_leg.cnam,
-                first_leg.uniqueid,
-                first_leg.linkedid,
-                last_leg.userfield,
-                leg_count.total_legs AS call_journey_count,
-                CASE
-                    WHEN first_leg.dcontext LIKE '%queue%' THEN 'queue'
-                    WHEN first_leg.dcontext LIKE '%ivr%'   THEN 'ivr'
-                    ELSE 'direct'
-                END AS call_app
-            FROM
-                (
-                    SELECT c.*
-                    FROM cdr c
-                    JOIN (
-                        SELECT linkedid, MIN(sequence) AS min_seq
-                        FROM cdr
-                        {sub_where}
-                        GROUP BY linkedid
-                    ) x ON c.linkedid = x.linkedid AND c.sequence = x.min_seq
-                ) first_leg
-            JOIN (
-                    SELECT c.*
-                    FROM cdr c
-                    JOIN (
-                        SELECT linkedid, MAX(sequence) AS max_seq
-                        FROM cdr
-                        {sub_where}
-                        GROUP BY linkedid
-                    ) x ON c.linkedid = x.linkedid AND c.sequence = x.max_seq
-                ) last_leg ON first_leg.linkedid = last_leg.linkedid
-            JOIN (
-                SELECT linkedid, COUNT(*) AS total_legs
-                FROM cdr
-                {sub_where}
-                GROUP BY linkedid
-            ) leg_count ON first_leg.linkedid = leg_count.linkedid
-        """.format(sub_where=sub_where)
-
-        # Build WHERE conditions (use first_leg for calldate/src, last_leg for dstchannel).
-        # The three GROUP BY subqueries reference {sub_where} left-to-right, so their
-        # date params come first (once per subquery), then these outer params.
-        conditions = []
-        params = list(sub_params) * 3
-
-        # Precise outer date bound. Compared against the bare column (no DATE()
-        # wrapper) so an index on calldate is usable; range form is equivalent to
-        # the old DATE()-based equality/inclusive-range comparisons.
-        if date:
-            conditions.append("first_leg.calldate >= %s AND first_leg.calldate < DATE_ADD(%s, INTERVAL 1 DAY)")
-            params.extend([date, date])
-        if date_from:
-            conditions.append("first_leg.calldate >= %s")
-            params.append(date_from)
-        if date_to:
-            conditions.append("first_leg.calldate < DATE_ADD(%s, INTERVAL 1 DAY)")
-            params.append(date_to)
-        # Filter by agent extension.
-        # The agent's extension lives in a DIFFERENT place per direction: on an
-        # OUTBOUND call it is the origin `channel` (dstchannel is the trunk, src is
-        # the outbound caller-ID), on an INBOUND/queue call it is the `dstchannel`,
-        # and it is rarely first_leg.src. It is also usually on an intermediate leg
-        # (queue answer / transfer), not the first or last. Checking only
-        # first_leg.src + last_leg.dstchannel therefore dropped most agent calls,
-        # which is what made the agent/supervisor Dashboard tiles read low or zero.
-        # Scan all legs and collapse via linkedid so any matching leg surfaces the
-        # one call-log row (kept identical to get_call_log_count_from_db).
-        if allowed_extensions is not None:
-            if not allowed_extensions:
-                conditions.append("1 = 0")
-            else:
-                placeholders = ", ".join(["%s"] * len(allowed_extensions))
-                conditions.append(
-                    "first_leg.linkedid IN ("
-                    "SELECT linkedid FROM cdr WHERE "
-                    "SUBSTRING_INDEX(SUBSTRING_INDEX(dstchannel, '-', 1), '/', -1) IN (" + placeholders + ") "
-                    "OR SUBSTRING_INDEX(SUBSTRING_INDEX(channel, '-', 1), '/', -1) IN (" + placeholders + ") "
-                    "OR src IN (" + placeholders + ")"
-                    ")"
-                )
-                params.extend(allowed_extensions)
-                params.extend(allowed_extensions)
-                params.extend(allowed_extensions)
-
-        # Free-text search across caller/destination and call ids (whole-history search).
-        if search:
-            like = f"%{search.strip()}%"
-            conditions.append(
-                "("
-                "first_leg.src LIKE %s OR first_leg.dst LIKE %s OR last_leg.dst LIKE %s "
-                "OR first_leg.uniqueid LIKE %s OR first_leg.linkedid LIKE %s"
-                ")"
-            )
-            params.extend([like, like, like, like, like])
-
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        # Add ordering by calldate (most recent first)
-        query += " ORDER BY first_leg.calldate DESC"
-        
-        # Add limit if provided (validate it's a positive integer)
-        if limit:
-            if not isinstance(limit, int) or limit <= 0:
-                raise ValueError("limit must be a positive integer")
-            query += " LIMIT %s"
-            params.append(limit)
-
         # Execute query with parameters
-        cursor.execute(query, tuple(params) if params else None)
+        cursor.execute(query, params or None)
         
         data = cursor.fetchall()
 
-        cursor.close()
-        conn.close()
-
     except Error as e:
         log.warning(f"⚠️  Database error getting call log: {e}")
+    finally:
+        _safe_close(cursor, conn)
 
     return data
 
 
+def _stream_call_log(config: dict, query: str, params: tuple):
+    """Yield call-log rows one at a time from an unbuffered cursor.
+
+    Rows arrive from the server as the caller iterates, so a month-long range is
+    never materialized in memory. They are the driver's tuples, in _CDR_FIELDS
+    order: the only consumer unpacks them straight into locals, so a dict per
+    row would be built just to be read once. Unread rows are discarded on early
+    exit so the connection goes back to the pool clean.
+
+    An error before the first row yields nothing, like the buffered path. An
+    error after rows have been yielded is re-raised: ending quietly would hand
+    the caller a truncated scan that looks complete."""
+    conn = None
+    cursor = None
+    started = False
+    try:
+        conn = _get_connection(config)
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query, params or None)
+        for row in cursor:
+            started = True
+            yield row
+    except Error as e:
+        log.warning(f"⚠️  Database error getting call log: {e}")
+        if started:
+            raise
+    finally:
+        if conn is not None:
+            try:
+                conn.consume_results()
+            except Error:
+                pass
+        _safe_close(cursor, conn)
+
+
 def get_call_log_count_from_db(date: str = None,
                                 date_from: str = None, date_to: str = None,
                                 allowed_extensions: Optional[List[str]] = None,
@@ -607,10 +816,16 @@ def get_call_log_count_from_db(date: str = None,
     """
     Get total count of call log rows with the same filters as get_call_log_from_db
     (same JOIN/WHERE, no limit). Used so UI can show total calls beyond the fetch limit.
+    Raises ValueError on a malformed date.
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_CDR', ''))
+    date = _parse_date_param(date, 'date')
+    date_from = _parse_date_param(date_from, 'date_from')
+    date_to = _parse_date_param(date_to, 'date_to')
+    config = _CDR_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
 
         # Fast path: COUNT(DISTINCT linkedid) is orders of magnitude faster than
@@ -635,8 +850,6 @@ def get_call_log_count_from_db(date: str = None,
         if allowed_extensions is not None:
             if not allowed_extensions:
                 # No allowed extensions → zero results immediately.
-                cursor.close()
-                conn.close()
                 return 0
             placeholders = ", ".join(["%s"] * len(allowed_extensions))
             # Match the agent on origin channel (outbound), destination channel
@@ -663,12 +876,12 @@ def get_call_log_count_from_db(date: str = None,
 
         cursor.execute(query, tuple(params) if params else None)
         row = cursor.fetchone()
-        cursor.close()
-        conn.close()
         return (row or {}).get("cnt", 0) or 0
     except Error as e:
         log.warning(f"⚠️  Database error getting call log count: {e}")
         return 0
+    finally:
+        _safe_close(cursor, conn)
 
 
 def insert_call_notification(
@@ -682,9 +895,11 @@ def insert_call_notification(
     Insert a call notification (OpDesk DB). Called from AMI on hangup.
     reason: e.g. busy, noanswer, failed. Returns new id or None on error.
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO call_notifications (extension, caller_from, queue, call_id, reason)
@@ -693,12 +908,12 @@ def insert_call_notification(
         )
         conn.commit()
         nid = cursor.lastrowid
-        cursor.close()
-        conn.close()
         return nid
     except Error as e:
         log.warning(f"⚠️  Database error inserting call notification: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
 
 
 def upsert_call_vad(
@@ -718,11 +933,11 @@ def upsert_call_vad(
     """
     if not uniqueid:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO call_vad
@@ -755,11 +970,11 @@ def get_call_vad_from_db(uniqueid: str) -> Optional[dict]:
     """Fetch VAD analysis for a single call by uniqueid. Returns None if not found."""
     if not uniqueid:
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT * FROM call_vad WHERE uniqueid = %s LIMIT 1",
@@ -785,10 +1000,12 @@ def get_call_notifications_from_db(
     """
     Get call notifications from OpDesk DB. Filter by extension and/or status (new, read, archived).
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     data = []
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         conditions = []
         params: List[Any] = []
@@ -807,41 +1024,45 @@ def get_call_notifications_from_db(
             for row in data:
                 if row.get("event_time"):
                     row["event_time"] = row["event_time"].isoformat() if hasattr(row["event_time"], "isoformat") else str(row["event_time"])
-        cursor.close()
-        conn.close()
     except Error as e:
         log.warning(f"⚠️  Database error getting call notifications: {e}")
+    finally:
+        _safe_close(cursor, conn)
     return data
 
 
 def get_call_notification_by_id(notification_id: int) -> Optional[dict]:
     """Get a single call notification by id. Returns None if not found."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT id, extension, caller_from, queue, status_flag, event_time, call_id, reason FROM call_notifications WHERE id = %s",
             (notification_id,),
         )
         row = cursor.fetchone()
-        cursor.close()
-        conn.close()
         if row and row.get("event_time"):
             row["event_time"] = row["event_time"].isoformat() if hasattr(row["event_time"], "isoformat") else str(row["event_time"])
         return row
     except Error as e:
         log.warning(f"⚠️  Database error getting call notification: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
 
 
 def update_call_notification_status(notification_id: int, status_flag: str) -> bool:
     """Update a call notification's status (read or archived). Returns True on success."""
     if status_flag not in ("new", "read", "archived"):
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE call_notifications SET status_flag = %s WHERE id = %s",
@@ -849,12 +1070,12 @@ def update_call_notification_status(notification_id: int, status_flag: str) -> b
         )
         conn.commit()
         ok = cursor.rowcount > 0
-        cursor.close()
-        conn.close()
         return ok
     except Error as e:
         log.warning(f"⚠️  Database error updating call notification: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 # =============================================================================
@@ -883,9 +1104,11 @@ def register_device_token(
     """
     if platform not in ("ios", "android", "web") or token_type not in ("voip", "alert") or not token:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO device_tokens
@@ -901,31 +1124,33 @@ def register_device_token(
             (user_id, extension or None, platform, token_type, token, _token_hash(token), app_version or None),
         )
         conn.commit()
-        cursor.close()
-        conn.close()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error registering device token: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def delete_device_token(token: str) -> bool:
     """Delete a device token (on logout, or when a push provider reports it as stale/unregistered)."""
     if not token:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM device_tokens WHERE token_hash = %s", (_token_hash(token),))
         conn.commit()
         ok = cursor.rowcount > 0
-        cursor.close()
-        conn.close()
         return ok
     except Error as e:
         log.warning(f"⚠️  Database error deleting device token: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_device_tokens_for_extension(
@@ -939,10 +1164,12 @@ def get_device_tokens_for_extension(
     """
     if not extension:
         return []
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     data: List[dict] = []
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         query = "SELECT token, platform, token_type FROM device_tokens WHERE extension = %s"
         params: List[Any] = [extension]
@@ -951,43 +1178,50 @@ def get_device_tokens_for_extension(
             params.append(token_type)
         cursor.execute(query, tuple(params))
         data = cursor.fetchall()
-        cursor.close()
-        conn.close()
     except Error as e:
         log.warning(f"⚠️  Database error getting device tokens: {e}")
+    finally:
+        _safe_close(cursor, conn)
     return data
 
 
 def prune_stale_device_tokens(days: int = 90) -> int:
     """Delete device tokens not refreshed in `days` days. Returns the number of rows deleted."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "DELETE FROM device_tokens WHERE last_seen_at < NOW() - INTERVAL %s DAY", (days,)
         )
         conn.commit()
         count = cursor.rowcount
-        cursor.close()
-        conn.close()
         if count:
             log.info(f"Pruned {count} stale device token(s) (not seen in {days}+ days)")
         return count
     except Error as e:
         log.warning(f"⚠️  Database error pruning stale device tokens: {e}")
         return 0
+    finally:
+        _safe_close(cursor, conn)
 
 
 def check_database_exists(db_name: str) -> bool:
     """Check if a database exists."""
-    config_no_db = get_db_config(os.getenv('DB_PASSWORD'),os.getenv('DB_OpDesk', 'OpDesk')).copy()
+    config_no_db = _OPDESK_DB_CONFIG.copy()
     config_no_db.pop('database')
     
     try:
         conn = mysql.connector.connect(**config_no_db)
         cursor = conn.cursor()
-        cursor.execute("SHOW DATABASES LIKE %s", (db_name,))
+        # Exact-match lookup: stops at the first hit, and unlike SHOW DATABASES
+        # LIKE it does not treat '_' / '%' in the name as wildcards.
+        cursor.execute(
+            "SELECT 1 FROM information_schema.schemata WHERE schema_name = %s LIMIT 1",
+            (db_name,),
+        )
         result = cursor.fetchone()
         cursor.close()
         conn.close()
@@ -997,9 +1231,70 @@ def check_database_exists(db_name: str) -> bool:
         return False
 
 
+def _split_sql_statements(sql: str) -> List[str]:
+    """Split an SQL script into statements in one pass over the text.
+
+    Semicolons inside quoted strings/identifiers or comments do not end a
+    statement. `--`, `#` and `/* */` comments are dropped (MySQL's executable
+    `/*! ... */` comments are kept); newlines are preserved. A mysql-client
+    style `DELIMITER $$` line switches the terminator, so stored routine and
+    trigger bodies with inner semicolons come through as one statement.
+    """
+    statements: List[str] = []
+    buf: List[str] = []
+    delim = ';'
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"', '`'):
+            # Quoted literal/identifier: copy through to the matching close quote
+            j = i + 1
+            while j < n:
+                if sql[j] == '\\' and ch != '`':
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:  # doubled quote escape
+                        j += 2
+                        continue
+                    break
+                j += 1
+            buf.append(sql[i:j + 1])
+            i = j + 1
+        elif ch == '#' or (ch == '-' and sql.startswith('--', i) and (i + 2 == n or sql[i + 2].isspace())):
+            j = sql.find('\n', i)
+            i = n if j == -1 else j
+        elif ch == '/' and sql.startswith('/*', i) and not sql.startswith('/*!', i):
+            j = sql.find('*/', i + 2)
+            i = n if j == -1 else j + 2
+            buf.append(' ')
+        elif ((i == 0 or sql[i - 1] == '\n') and sql[i:i + 10].upper() == 'DELIMITER '
+              and not ''.join(buf).strip()):
+            # Client-side command, never sent to the server
+            j = sql.find('\n', i)
+            j = n if j == -1 else j
+            new_delim = sql[i + 10:j].strip()
+            if new_delim:
+                delim = new_delim.split()[0]
+            i = j
+        elif ch == delim[0] and sql.startswith(delim, i):
+            stmt = ''.join(buf).strip()
+            if stmt:
+                statements.append(stmt)
+            buf = []
+            i += len(delim)
+        else:
+            buf.append(ch)
+            i += 1
+    stmt = ''.join(buf).strip()
+    if stmt:
+        statements.append(stmt)
+    return statements
+
+
 def execute_sql_file(sql_file_path: str) -> bool:
     """Execute SQL commands from a file."""
-    config_no_db = get_db_config(os.getenv('DB_PASSWORD'),os.getenv('DB_OpDesk', 'OpDesk')).copy()
+    config_no_db = _OPDESK_DB_CONFIG.copy()
     config_no_db.pop('database')
     
     try:
@@ -1011,21 +1306,10 @@ def execute_sql_file(sql_file_path: str) -> bool:
         conn = mysql.connector.connect(**config_no_db)
         cursor = conn.cursor()
         
-        # Split SQL content by semicolons and execute each statement
-        # Filter out empty statements, comments, and blank lines
-        statements = []
-        for line in sql_content.split('\n'):
-            line = line.strip()
-            # Skip empty lines and full-line comments
-            if not line or line.startswith('--'):
-                continue
-            statements.append(line)
-        
-        # Join statements and split by semicolon
-        full_sql = ' '.join(statements)
-        sql_statements = [s.strip() for s in full_sql.split(';') if s.strip()]
-        
-        for statement in sql_statements:
+        # Statements still run one at a time (not multi=True): a failing
+        # statement is logged and skipped rather than aborting the rest, and the
+        # multi= argument is gone from newer mysql-connector releases.
+        for statement in _split_sql_statements(sql_content):
             if statement:
                 try:
                     cursor.execute(statement)
@@ -1050,7 +1334,7 @@ def execute_sql_file(sql_file_path: str) -> bool:
 
 
 # set_setting() re-runs init_settings_table() before every write as an
-# ensure-exists safety net. The full check (2-3 connections, SHOW TABLES, a log
+# ensure-exists safety net. The full check (a connection, a catalog lookup, a log
 # line) only needs to happen once per process — this flag makes repeats free.
 _settings_init_done = False
 
@@ -1063,15 +1347,29 @@ def init_settings_table():
     global _settings_init_done
     if _settings_init_done:
         return True
-    # Check if OpDesk database exists
-    if check_database_exists('OpDesk'):
+    # Connecting straight to the database doubles as the existence check
+    # (ER_BAD_DB_ERROR when it's missing): one pooled connection instead of a
+    # separate SHOW DATABASES probe followed by a second connect.
+    config = _OPDESK_DB_CONFIG
+    try:
+        conn = _get_connection(config)
+    except Error as e:
+        if getattr(e, 'errno', None) != 1049:  # anything but ER_BAD_DB_ERROR
+            log.error(f"❌ Failed to check if database exists: {e}")
+            return False
+        conn = None
+    if conn is not None:
         log.info("✅ OpDesk database already exists")
         _settings_init_done = True
+        cursor = None
         try:
-            config = get_db_config(os.getenv('DB_PASSWORD'),os.getenv('DB_OpDesk', 'OpDesk'))
-            conn = mysql.connector.connect(**config)
             cursor = conn.cursor()
-            cursor.execute("SHOW TABLES LIKE 'OpDesk_settings'")
+            # Exact-name lookup ('_' is not a wildcard here, unlike SHOW TABLES LIKE)
+            cursor.execute(
+                "SELECT 1 FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s LIMIT 1",
+                ('OpDesk_settings',),
+            )
             if not cursor.fetchone():
                 log.info("📋 Creating OpDesk_settings table...")
                 cursor.execute("""
@@ -1096,11 +1394,10 @@ def init_settings_table():
                     conn.commit()
                     os.remove(admin_hash_path)
                     log.info("✅ Admin password applied from installer")
-
-            cursor.close()
-            conn.close()
         except Error as e:
             log.warning(f"⚠️  Error checking/creating table: {e}")
+        finally:
+            _safe_close(cursor, conn)
         return True
     
     # Database doesn't exist, create it from schema.sql
@@ -1115,9 +1412,11 @@ def init_settings_table():
     
     # Execute schema.sql to create database and tables
     if execute_sql_file(schema_path):
+        conn = None
+        cursor = None
         try:
-            config = get_db_config(os.getenv('DB_PASSWORD'),os.getenv('DB_OpDesk', 'OpDesk'))
-            conn = mysql.connector.connect(**config)
+            config = _OPDESK_DB_CONFIG
+            conn = _get_connection(config)
             cursor = conn.cursor()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS OpDesk_settings (
@@ -1140,19 +1439,58 @@ def init_settings_table():
                     os.remove(admin_hash_path)
                     log.info("✅ Admin password applied from installer")
 
-            cursor.close()
-            conn.close()
             log.info("✅ OpDesk database and tables created successfully from schema.sql")
             _settings_init_done = True
             return True
         except Error as e:
             log.error(f"❌ Failed to create table after database creation: {e}")
             return False
+        finally:
+            _safe_close(cursor, conn)
     else:
         log.error("❌ Failed to create OpDesk database from schema.sql")
         return False
 
 
+# Settings reads are served from one in-process snapshot of the whole (small)
+# OpDesk_settings table, keyed by a version counter that set_setting() bumps
+# after each successful write: the stale snapshot becomes unreachable at once
+# and ages out of the LRU. A page reading N settings costs at most one query.
+# Only this process writes OpDesk_settings; call reset_settings_cache() after
+# editing the table out-of-band.
+_settings_version = 0
+_settings_version_lock = threading.Lock()
+
+
+def _bump_settings_version() -> None:
+    global _settings_version
+    with _settings_version_lock:
+        _settings_version += 1
+
+
+def reset_settings_cache() -> None:
+    """Drop every cached setting so the next read goes to the database."""
+    _bump_settings_version()
+    _load_all_settings_cached.cache_clear()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_all_settings_cached(version: int) -> Dict[str, Optional[str]]:
+    """Snapshot of every setting (treat as read-only). DB errors propagate, so they are never cached."""
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
+    try:
+        conn = _get_connection(config)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT setting_key, setting_value FROM OpDesk_settings")
+        # (key, value) tuples feed dict() directly; no per-row dict first
+        return dict(cursor.fetchall())
+    finally:
+        _safe_close(cursor, conn)
+
+
 def get_setting(key: str, default: str = None) -> str:
     """
     Get a setting value from the OpDesk database.
@@ -1164,31 +1502,65 @@ def get_setting(key: str, default: str = None) -> str:
     Returns:
         Setting value or default
     """
-    config = get_db_config(os.getenv('DB_PASSWORD'),'OpDesk')
-    
     try:
-        conn = mysql.connector.connect(**config)
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("SELECT setting_value FROM OpDesk_settings WHERE setting_key = %s", (key,))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        if result:
-            return result['setting_value'] or default
-        return default
-        
+        return _load_all_settings_cached(_settings_version).get(key) or default
     except Error as e:
         log.warning(f"⚠️  Database error getting setting {key}: {e}")
         return default
 
 
+# VALUES(setting_value) reuses the incoming row, so the value (which can be a
+# large JSON blob) goes over the wire once, and executemany() can fold many
+# rows into one multi-row INSERT.
+_SETTING_UPSERT_SQL = """
+    INSERT INTO OpDesk_settings (setting_key, setting_value)
+    VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE setting_value = VALUES(setting_value), updated_at = CURRENT_TIMESTAMP
+"""
+
+
+# Connection of the settings_batch() active on this thread, if any
+_settings_batch = threading.local()
+
+
+@contextmanager
+def settings_batch():
+    """Group the set_setting() calls made inside the block into one transaction.
+
+    A config save writes dozens of keys; inside the block they share one pooled
+    connection and a single commit (one log flush) on exit. An exception rolls
+    the whole block back, so a save rejected half-way persists nothing. The read
+    cache is invalidated once, after the commit. Nested blocks join the outer one.
+    """
+    if getattr(_settings_batch, 'conn', None) is not None:
+        yield
+        return
+    config = _OPDESK_DB_CONFIG
+    init_settings_table()
+    conn = _get_connection(config)
+    _settings_batch.conn = conn
+    try:
+        yield
+        conn.commit()
+        _bump_settings_version()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Error:
+            pass
+        raise
+    finally:
+        _settings_batch.conn = None
+        _safe_close(None, conn)
+
+
 def set_setting(key: str, value: str) -> bool:
     """
     Set a setting value in the OpDesk database.
     
+    Inside settings_batch() the write joins the batch transaction and is
+    committed when the block exits.
+    
     Args:
         key: Setting key name
         value: Setting value
@@ -1196,30 +1568,76 @@ def set_setting(key: str, value: str) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_OpDesk', 'OpDesk'))
+    batch_conn = getattr(_settings_batch, 'conn', None)
+    if batch_conn is not None:
+        cursor = None
+        try:
+            cursor = batch_conn.cursor()
+            cursor.execute(_SETTING_UPSERT_SQL, (key, value))
+            return True
+        except Error as e:
+            log.error(f"❌ Failed to set setting {key}: {e}")
+            return False
+        finally:
+            _safe_close(cursor)
+    
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     
     try:
         # Ensure database and table exist
         init_settings_table()
         
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO OpDesk_settings (setting_key, setting_value)
-            VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE setting_value = %s, updated_at = CURRENT_TIMESTAMP
-        """, (key, value, value))
+        cursor.execute(_SETTING_UPSERT_SQL, (key, value))
         
         conn.commit()
-        cursor.close()
-        conn.close()
+        _bump_settings_version()
         
         return True
         
     except Error as e:
         log.error(f"❌ Failed to set setting {key}: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
+
+
+def set_many_settings(settings: Dict[str, str]) -> bool:
+    """
+    Set several settings in one round-trip and one transaction.
+    
+    Args:
+        settings: Mapping of setting key -> value
+    
+    Returns:
+        True if every setting was written, False otherwise (nothing is written)
+    """
+    if not settings:
+        return True
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
+    
+    try:
+        # Ensure database and table exist
+        init_settings_table()
+        
+        conn = _get_connection(config)
+        cursor = conn.cursor()
+        cursor.executemany(_SETTING_UPSERT_SQL, list(settings.items()))
+        conn.commit()
+        _bump_settings_version()
+        return True
+        
+    except Error as e:
+        log.error(f"❌ Failed to set settings {sorted(settings)}: {e}")
+        return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_all_settings() -> dict:
@@ -1229,26 +1647,12 @@ def get_all_settings() -> dict:
     Returns:
         Dictionary of all settings
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''),os.getenv('DB_OpDesk', 'OpDesk'))
-    settings = {}
-
     try:
-        conn = mysql.connector.connect(**config)
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT setting_key, setting_value FROM OpDesk_settings")
-        results = cursor.fetchall()
-
-        for row in results:
-            settings[row['setting_key']] = row['setting_value']
-
-        cursor.close()
-        conn.close()
-
+        # Copy: callers may modify the result, the cached snapshot is shared
+        return dict(_load_all_settings_cached(_settings_version))
     except Error as e:
         log.warning(f"⚠️  Database error getting all settings: {e}")
-
-    return settings
+        return {}
 
 
 # ---------------------------------------------------------------------------
@@ -1257,42 +1661,85 @@ def get_all_settings() -> dict:
 
 def get_user_by_username(username: str) -> dict:
     """Get user by username. Returns dict with id, username, extension, name, role, password_hash, is_active or None."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT id, username, extension, name, role, password_hash, is_active FROM users WHERE username = %s",
             (username,)
         )
         row = cursor.fetchone()
-        cursor.close()
-        conn.close()
         return row
     except Error as e:
         log.warning(f"⚠️  Database error get_user_by_username: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_user_by_extension(extension: str) -> dict:
     """Get user by extension. Returns dict with id, username, extension, name, role, password_hash, is_active or None."""
     if not extension or not str(extension).strip():
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT id, username, extension, name, role, password_hash, is_active FROM users WHERE extension = %s",
             (str(extension).strip(),)
         )
         row = cursor.fetchone()
-        cursor.close()
-        conn.close()
         return row
     except Error as e:
         log.warning(f"⚠️  Database error get_user_by_extension: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
+
+
+def get_user_by_login(login: str) -> dict:
+    """Get user by username, or else by extension, in one query. Same row shape as get_user_by_username.
+
+    A username match wins over another user's extension match, as when the two
+    lookups ran back to back."""
+    if not login or not str(login).strip():
+        return None
+    login = str(login).strip()
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
+    try:
+        conn = _get_connection(config)
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id, username, extension, name, role, password_hash, is_active FROM users "
+            "WHERE username = %s OR extension = %s ORDER BY username = %s DESC LIMIT 1",
+            (login, login, login)
+        )
+        row = cursor.fetchone()
+        return row
+    except Error as e:
+        log.warning(f"⚠️  Database error get_user_by_login: {e}")
+        return None
+    finally:
+        _safe_close(cursor, conn)
+
+
+# bcrypt work factor for new hashes (existing hashes carry their own cost, so
+# changing this never invalidates a stored password).
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+
+def hash_user_password(password: str) -> str:
+    """bcrypt-hash a plain password with BCRYPT_ROUNDS."""
+    import bcrypt
+    return bcrypt.hashpw((password or '').encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
 
 
 def verify_user_password(password_hash: str, password: str) -> bool:
@@ -1309,16 +1756,18 @@ def verify_user_password(password_hash: str, password: str) -> bool:
 
 def update_last_login(user_id: int) -> None:
     """Update last_login_at for user."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET last_login_at = NOW() WHERE id = %s", (user_id,))
         conn.commit()
-        cursor.close()
-        conn.close()
     except Error as e:
         log.warning(f"⚠️  Database error update_last_login: {e}")
+    finally:
+        _safe_close(cursor, conn)
 
 
 def authenticate_user(login: str, password: str) -> dict:
@@ -1330,9 +1779,7 @@ def authenticate_user(login: str, password: str) -> dict:
     if not login or not password:
         return None
     login = str(login).strip()
-    user = get_user_by_username(login)
-    if not user:
-        user = get_user_by_extension(login)
+    user = get_user_by_login(login)
     if not user:
         return None
     if not user.get('is_active', 1):
@@ -1355,31 +1802,44 @@ def authenticate_user(login: str, password: str) -> dict:
 
 def get_all_users() -> list:
     """Get all users (id, username, extension, name, role, is_active, monitor_modes). No password_hash."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT id, username, extension, name, role, is_active FROM users ORDER BY username"
         )
         rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        # Every user's modes in one query on the same connection (was one
+        # get_user_monitor_modes round-trip per user); same filtering/default.
+        modes_by_user: Dict[Any, list] = {}
+        try:
+            cursor.execute("SELECT user_id, mode FROM user_monitor_modes ORDER BY mode")
+            for r in cursor.fetchall():
+                if r.get('mode') in VALID_MONITOR_MODES:
+                    modes_by_user.setdefault(r['user_id'], []).append(r['mode'])
+        except Error:
+            pass
         out = []
         for r in rows:
             d = dict(r)
-            d['monitor_modes'] = get_user_monitor_modes(d['id'])
+            d['monitor_modes'] = modes_by_user.get(d['id']) or ['listen']
             out.append(d)
         return out
     except Error as e:
         log.warning(f"⚠️  Database error get_all_users: {e}")
         return []
+    finally:
+        _safe_close(cursor, conn)
 
 
 def create_user(username: str, password: str, name: str = None, extension: str = None,
                 role: str = 'supervisor', monitor_mode: str = 'listen',
-                monitor_modes: list = None) -> Optional[int]:
-    """Create user. Returns new user id or None on error/duplicate. monitor_modes: optional list ['listen','whisper','barge']."""
+                monitor_modes: list = None, password_hash: str = None) -> Optional[int]:
+    """Create user. Returns new user id or None on error/duplicate. monitor_modes: optional list ['listen','whisper','barge'].
+    password_hash: an existing bcrypt hash ('$2…') to store as-is instead of hashing password."""
     if not username or not username.strip():
         return None
     username = username.strip()
@@ -1389,15 +1849,17 @@ def create_user(username: str, password: str, name: str = None, extension: str =
         ext = str(extension).strip()
         if get_user_by_extension(ext):
             return None
+    if not (password_hash and password_hash.startswith('$2')):
+        try:
+            password_hash = hash_user_password(password)
+        except Exception as e:
+            log.warning(f"Password hash failed: {e}")
+            return None
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        import bcrypt
-        password_hash = bcrypt.hashpw((password or '').encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    except Exception as e:
-        log.warning(f"Password hash failed: {e}")
-        return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
-    try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO users (username, extension, password_hash, name, role) "
@@ -1407,8 +1869,6 @@ def create_user(username: str, password: str, name: str = None, extension: str =
         )
         user_id = cursor.lastrowid
         conn.commit()
-        cursor.close()
-        conn.close()
         if monitor_modes is not None:
             set_user_monitor_modes(user_id, monitor_modes)
         else:
@@ -1418,15 +1878,27 @@ def create_user(username: str, password: str, name: str = None, extension: str =
     except Error as e:
         log.warning(f"⚠️  Database error create_user: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
 
 
 def update_user(user_id: int | None = None, username: str = None, name: str = None, extension: str = None, role: str = None,
                 is_active: bool = None, monitor_mode: str = None, monitor_modes: list = None,
                 password: str = None) -> bool:
     """Update user. password optional (new hash). monitor_modes: optional list to set multiple modes. Returns True on success."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    # Hash before checking out a connection: bcrypt takes ~100+ ms at the
+    # default cost and a pooled connection should not sit idle meanwhile.
+    password_hash = None
+    if password is not None and password:
+        try:
+            password_hash = hash_user_password(password)
+        except Exception:
+            pass
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
 
         updates = []
@@ -1446,14 +1918,9 @@ def update_user(user_id: int | None = None, username: str = None, name: str = No
         if is_active is not None:
             updates.append("is_active = %s")
             params.append(1 if is_active else 0)
-        if password is not None and password:
-            try:
-                import bcrypt
-                password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                updates.append("password_hash = %s")
-                params.append(password_hash)
-            except Exception:
-                pass
+        if password_hash:
+            updates.append("password_hash = %s")
+            params.append(password_hash)
         if updates:
             where_clauses = []
             if user_id is not None:
@@ -1470,19 +1937,21 @@ def update_user(user_id: int | None = None, username: str = None, name: str = No
                 conn.commit()
         if monitor_modes is not None:
             set_user_monitor_modes(user_id, monitor_modes)
-        cursor.close()
-        conn.close()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error update_user: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def delete_user(user_id: int) -> bool:
     """Delete user and their group assignments and monitor modes. Returns True on success."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM user_groups WHERE user_id = %s", (user_id,))
         try:
@@ -1491,35 +1960,42 @@ def delete_user(user_id: int) -> bool:
             pass
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         conn.commit()
-        cursor.close()
-        conn.close()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error delete_user: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 VALID_MONITOR_MODES = ('listen', 'whisper', 'barge')
 
 
+def _read_monitor_modes(conn, user_id: int) -> list:
+    """get_user_monitor_modes on a connection the caller already holds."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT mode FROM user_monitor_modes WHERE user_id = %s ORDER BY mode", (user_id,))
+        modes = [mode for (mode,) in cursor.fetchall() if mode in VALID_MONITOR_MODES]
+    except Error:
+        modes = []
+    finally:
+        _safe_close(cursor)
+    return modes if modes else ['listen']
+
+
 def get_user_monitor_modes(user_id: int) -> list:
     """Return list of monitor modes for user (from user_monitor_modes). Default ['listen'] if none set."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
     try:
-        conn = mysql.connector.connect(**config)
-        cursor = conn.cursor(dictionary=True)
-        try:
-            cursor.execute("SELECT mode FROM user_monitor_modes WHERE user_id = %s ORDER BY mode", (user_id,))
-            rows = cursor.fetchall()
-            modes = [r['mode'] for r in rows if r.get('mode') in VALID_MONITOR_MODES]
-        except Error:
-            modes = []
-        cursor.close()
-        conn.close()
-        return modes if modes else ['listen']
+        conn = _get_connection(config)
+        return _read_monitor_modes(conn, user_id)
     except Error as e:
         log.warning(f"⚠️  Database error get_user_monitor_modes: {e}")
         return ['listen']
+    finally:
+        _safe_close(None, conn)
 
 
 def set_user_monitor_modes(user_id: int, modes: list) -> bool:
@@ -1529,106 +2005,120 @@ def set_user_monitor_modes(user_id: int, modes: list) -> bool:
     valid = [m for m in (modes or []) if m in VALID_MONITOR_MODES]
     if not valid:
         valid = ['listen']
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM user_monitor_modes WHERE user_id = %s", (user_id,))
-            for m in valid:
-                cursor.execute("INSERT INTO user_monitor_modes (user_id, mode) VALUES (%s, %s)", (user_id, m))
+            # executemany folds an INSERT ... VALUES into one multi-row statement
+            cursor.executemany(
+                "INSERT INTO user_monitor_modes (user_id, mode) VALUES (%s, %s)",
+                [(user_id, m) for m in valid],
+            )
         except Error as e:
             log.warning(f"⚠️  set_user_monitor_modes: {e}")
-            cursor.close()
-            conn.close()
             return False
         conn.commit()
-        cursor.close()
-        conn.close()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error set_user_monitor_modes: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_user_webrtc_credentials(user_id: int) -> Optional[dict]:
     """Get extension for the given user (for WebRTC softphone). Returns None if user not found."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT extension FROM users WHERE id = %s",
             (user_id,)
         )
         row = cursor.fetchone()
-        cursor.close()
-        conn.close()
         if not row:
             return None
         return {"extension": row.get("extension")}
     except Error as e:
         log.warning(f"⚠️  Database error get_user_webrtc_credentials: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_user_by_id(user_id: int) -> Optional[dict]:
     """Get user by id (no password_hash). Includes monitor_modes (list)."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
+        # One round trip: this runs on every authenticated request
         cursor.execute(
-            "SELECT id, username, extension, name, role, is_active FROM users WHERE id = %s",
+            """SELECT u.id, u.username, u.extension, u.name, u.role, u.is_active,
+                      GROUP_CONCAT(m.mode ORDER BY m.mode) AS modes
+               FROM users u
+               LEFT JOIN user_monitor_modes m ON m.user_id = u.id
+               WHERE u.id = %s
+               GROUP BY u.id""",
             (user_id,)
         )
         row = cursor.fetchone()
         if not row:
-            cursor.close()
-            conn.close()
             return None
         row = dict(row)
-        row['monitor_modes'] = get_user_monitor_modes(user_id)
-        cursor.close()
-        conn.close()
+        modes = [m for m in (row.pop('modes') or '').split(',') if m in VALID_MONITOR_MODES]
+        row['monitor_modes'] = modes if modes else ['listen']
         return row
     except Error as e:
         log.warning(f"⚠️  Database error get_user_by_id: {e}")
         return None
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_user_group_ids(user_id: int) -> list:
     """Return list of group ids the user belongs to (excluding user_<id> auto-groups for display)."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     out = []
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT g.id FROM user_groups ug JOIN groups g ON ug.group_id = g.id WHERE ug.user_id = %s AND g.name NOT LIKE 'user\\_%' ORDER BY g.name",
             (user_id,)
         )
         out = [r['id'] for r in cursor.fetchall()]
-        cursor.close()
-        conn.close()
     except Error as e:
         log.warning(f"⚠️  Database error get_user_group_ids: {e}")
+    finally:
+        _safe_close(cursor, conn)
     return out
 
 
 def get_user_agents_and_queues(user_id: int) -> tuple:
     """Return (list of agent extensions, list of queue extensions) for user via their groups. Queue extensions are used for filtering in get_current_state (monitor.queues is keyed by extension)."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     agents = []
     queues = []
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT group_id FROM user_groups WHERE user_id = %s", (user_id,))
         group_ids = [r['group_id'] for r in cursor.fetchall()]
         if not group_ids:
-            cursor.close()
-            conn.close()
             return agents, queues
         placeholders = ",".join(["%s"] * len(group_ids))
         cursor.execute(
@@ -1642,10 +2132,10 @@ def get_user_agents_and_queues(user_id: int) -> tuple:
             tuple(group_ids)
         )
         queues = [str(r['extension']) for r in cursor.fetchall() if r.get('extension')]
-        cursor.close()
-        conn.close()
     except Error as e:
         log.warning(f"⚠️  Database error get_user_agents_and_queues: {e}")
+    finally:
+        _safe_close(cursor, conn)
     return agents, queues
 
 
@@ -1659,12 +2149,12 @@ def get_agent_login_queues(agent_ext: str) -> list:
     ext = str(agent_ext or '').strip()
     if not ext:
         return []
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     queues = []
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT group_id FROM group_agents WHERE agent_ext = %s", (ext,))
         group_ids = [r['group_id'] for r in cursor.fetchall()]
@@ -1692,9 +2182,11 @@ def set_user_agents_and_queues(user_id: int, agent_extensions: list, queue_names
     """
     if not user_id:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         group_name = f"user_{user_id}"
         cursor.execute("SELECT id FROM groups WHERE name = %s", (group_name,))
@@ -1728,12 +2220,12 @@ def set_user_agents_and_queues(user_id: int, agent_extensions: list, queue_names
             except Error:
                 pass
         conn.commit()
-        cursor.close()
-        conn.close()
         return True
     except Error as e:
         log.warning(f"⚠️  Database error set_user_agents_and_queues: {e}")
         return False
+    finally:
+        _safe_close(cursor, conn)
 
 
 def _safe_close(cursor=None, conn=None) -> None:
@@ -1758,11 +2250,11 @@ def get_agent_name_by_extension(extension: str) -> Optional[str]:
     """
     if not extension:
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT name FROM users WHERE extension = %s "
@@ -1778,35 +2270,62 @@ def get_agent_name_by_extension(extension: str) -> Optional[str]:
         _safe_close(cursor, conn)
 
 
+def _read_group_members(cursor, group_id: Optional[int] = None) -> dict:
+    """Agents, queues and user ids per group id, one query per member table.
+
+    With group_id=None every group is read, so listing G groups costs three
+    queries instead of 3 * G. Rows come back flat and are bucketed here rather
+    than through GROUP_CONCAT, which truncates at group_concat_max_len.
+    """
+    where = "" if group_id is None else " WHERE group_id = %s"
+    params = () if group_id is None else (group_id,)
+    members = {}
+
+    def bucket(gid):
+        return members.setdefault(gid, {"agent_extensions": [], "queues": [], "user_ids": []})
+
+    cursor.execute("SELECT group_id, agent_ext FROM group_agents" + where, params)
+    for x in cursor.fetchall():
+        if x.get('agent_ext'):
+            bucket(x['group_id'])["agent_extensions"].append(x['agent_ext'])
+    cursor.execute(
+        "SELECT gq.group_id, q.extension, q.queue_name FROM group_queues gq JOIN queues q ON gq.queue_extension = q.extension"
+        + where.replace(" group_id", " gq.group_id"),
+        params
+    )
+    for x in cursor.fetchall():
+        bucket(x['group_id'])["queues"].append({"extension": x["extension"], "queue_name": x["queue_name"]})
+    cursor.execute("SELECT group_id, user_id FROM user_groups" + where, params)
+    for x in cursor.fetchall():
+        bucket(x['group_id'])["user_ids"].append(x['user_id'])
+    return members
+
+
+def _group_dict(r: dict, members: dict) -> dict:
+    m = members.get(r['id']) or {"agent_extensions": [], "queues": [], "user_ids": []}
+    return {
+        "id": r['id'],
+        "name": r["name"],
+        "agent_extensions": m["agent_extensions"],
+        "queues": m["queues"],
+        "user_ids": m["user_ids"],
+    }
+
+
 def get_groups_list() -> list:
     """Return all groups (excluding auto-created user_<id> ones) with agents, queues, and user ids."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     out = []
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT id, name FROM groups WHERE name NOT LIKE 'user\_%' ORDER BY name")
         rows = cursor.fetchall()
-        for r in rows:
-            gid = r['id']
-            cursor.execute("SELECT agent_ext FROM group_agents WHERE group_id = %s", (gid,))
-            agents = [x['agent_ext'] for x in cursor.fetchall() if x.get('agent_ext')]
-            cursor.execute(
-                "SELECT q.extension, q.queue_name FROM group_queues gq JOIN queues q ON gq.queue_extension = q.extension WHERE gq.group_id = %s",
-                (gid,)
-            )
-            queues = [{"extension": x["extension"], "queue_name": x["queue_name"]} for x in cursor.fetchall()]
-            cursor.execute("SELECT user_id FROM user_groups WHERE group_id = %s", (gid,))
-            user_ids = [x['user_id'] for x in cursor.fetchall()]
-            out.append({
-                "id": gid,
-                "name": r["name"],
-                "agent_extensions": agents,
-                "queues": queues,
-                "user_ids": user_ids,
-            })
+        if rows:
+            members = _read_group_members(cursor)
+            out = [_group_dict(r, members) for r in rows]
     except Error as e:
         log.warning(f"⚠️  Database error get_groups_list: {e}")
     finally:
@@ -1816,33 +2335,17 @@ def get_groups_list() -> list:
 
 def get_group(group_id: int):
     """Return one group by id with agents, queues, and user ids, or None."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT id, name FROM groups WHERE id = %s", (group_id,))
         r = cursor.fetchone()
         if not r:
             return None
-        gid = r['id']
-        cursor.execute("SELECT agent_ext FROM group_agents WHERE group_id = %s", (gid,))
-        agents = [x['agent_ext'] for x in cursor.fetchall() if x.get('agent_ext')]
-        cursor.execute(
-            "SELECT q.extension, q.queue_name FROM group_queues gq JOIN queues q ON gq.queue_extension = q.extension WHERE gq.group_id = %s",
-            (gid,)
-        )
-        queues = [{"extension": x["extension"], "queue_name": x["queue_name"]} for x in cursor.fetchall()]
-        cursor.execute("SELECT user_id FROM user_groups WHERE group_id = %s", (gid,))
-        user_ids = [x['user_id'] for x in cursor.fetchall()]
-        return {
-            "id": gid,
-            "name": r["name"],
-            "agent_extensions": agents,
-            "queues": queues,
-            "user_ids": user_ids,
-        }
+        return _group_dict(r, _read_group_members(cursor, r['id']))
     except Error as e:
         log.warning(f"⚠️  Database error get_group: {e}")
         return None
@@ -1855,11 +2358,11 @@ def create_group(name: str):
     name = (name or '').strip()
     if not name:
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("INSERT INTO groups (name) VALUES (%s)", (name,))
         gid = cursor.lastrowid
@@ -1877,11 +2380,11 @@ def update_group(group_id: int, name: str) -> bool:
     name = (name or '').strip()
     if not name or not group_id:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("UPDATE groups SET name = %s WHERE id = %s AND name NOT LIKE 'user\_%'", (name, group_id))
         ok = cursor.rowcount > 0
@@ -1899,11 +2402,11 @@ def set_group_agents(group_id: int, agent_extensions: list) -> bool:
     back the whole replacement, so a group is never left with a partial member set."""
     if not group_id:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM group_agents WHERE group_id = %s", (group_id,))
         for ext in (agent_extensions or []):
@@ -1931,11 +2434,11 @@ def set_group_queues(group_id: int, queue_extensions: list) -> bool:
     set_group_agents)."""
     if not group_id:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM group_queues WHERE group_id = %s", (group_id,))
         for qext in (queue_extensions or []):
@@ -1969,11 +2472,11 @@ def set_group_users(group_id: int, user_ids: list) -> bool:
             clean_uids.append(int(uid))
         except (ValueError, TypeError):
             continue
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM user_groups WHERE group_id = %s", (group_id,))
         for uid in clean_uids:
@@ -2002,11 +2505,11 @@ def set_user_groups(user_id: int, group_ids: list) -> bool:
             clean_gids.append(int(gid))
         except (ValueError, TypeError):
             continue
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM user_groups WHERE user_id = %s", (user_id,))
         for gid in clean_gids:
@@ -2029,11 +2532,11 @@ def delete_group(group_id: int) -> bool:
     """Delete a group (only if not a user_<id> auto-group). CASCADE removes group_agents, group_queues, user_groups."""
     if not group_id:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM groups WHERE id = %s AND name NOT LIKE 'user\_%'", (group_id,))
         ok = cursor.rowcount > 0
@@ -2048,30 +2551,32 @@ def delete_group(group_id: int) -> bool:
 
 def get_agents_list() -> list:
     """Get list of agents from OpDesk agents table: [{ extension, name }, ...]."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT extension, name FROM agents ORDER BY extension")
         rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
         return [{"extension": r["extension"], "name": r.get("name") or r["extension"]} for r in rows]
     except Error as e:
         log.warning(f"⚠️  Database error get_agents_list: {e}")
         return []
+    finally:
+        _safe_close(cursor, conn)
 
 
 def get_queues_list() -> list:
     """Get list of queues from OpDesk queues table: [{ extension, queue_name }, ...]. Excludes 'default' queue."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
+    conn = None
+    cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT extension, queue_name FROM queues ORDER BY queue_name")
         rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
         return [
             {"extension": r["extension"], "queue_name": r["queue_name"]}
             for r in rows
@@ -2080,6 +2585,8 @@ def get_queues_list() -> list:
     except Error as e:
         log.warning(f"⚠️  Database error get_queues_list: {e}")
         return []
+    finally:
+        _safe_close(cursor, conn)
 
 
 def sync_agents_from_extensions(extension_list: list, name_map: dict,
@@ -2094,11 +2601,11 @@ def sync_agents_from_extensions(extension_list: list, name_map: dict,
     normalized = [str(e).strip() for e in (extension_list or []) if str(e).strip()]
     if not normalized and not (prune and prune_all_when_empty):
         return
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         for ext in normalized:
             name = (name_map or {}).get(ext) or ext
@@ -2131,11 +2638,11 @@ def sync_queues_from_list(queue_extensions: list, name_map: dict = None,
     normalized = [q for q in normalized if q and q.lower() != "default"]
     if not normalized and not (prune and prune_all_when_empty):
         return
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         for qext in normalized:
             name = (name_map or {}).get(qext) or qext
@@ -2179,11 +2686,11 @@ def init_call_supervision_table() -> None:
     """Create the call_supervision table (if missing). One row per ChanSpy leg,
     keyed by the spy channel's linkedid, so the call log can flag/hide supervision
     (listen/whisper/barge) rows and attach them to the monitored call."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS call_supervision (
@@ -2221,11 +2728,11 @@ def record_supervision(
         return False
     if mode not in ("listen", "whisper", "barge"):
         mode = "listen"
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             """INSERT INTO call_supervision
@@ -2258,12 +2765,12 @@ def get_supervision_by_spy_keys(keys: List[str]) -> dict:
     ids = [str(x) for x in keys if x]
     if not ids:
         return {}
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     out: dict = {}
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         placeholders = ", ".join(["%s"] * len(ids))
         cursor.execute(
@@ -2294,12 +2801,12 @@ def get_supervision_targets(target_linkedids: List[str]) -> dict:
     ids = [str(x) for x in target_linkedids if x]
     if not ids:
         return {}
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     out: dict = {}
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         placeholders = ", ".join(["%s"] * len(ids))
         cursor.execute(
@@ -2321,11 +2828,11 @@ def get_supervision_targets(target_linkedids: List[str]) -> dict:
 
 def init_pause_reasons_table() -> None:
     """Create the pause_reasons table (if missing) and seed default codes once."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS pause_reasons (
@@ -2348,14 +2855,22 @@ def init_pause_reasons_table() -> None:
                     "VALUES (%s, %s, %s, %s, %s, 1, %s)",
                     (code, label, productive, color, order, is_system),
                 )
-        # Widen the device_tokens.platform enum to include 'web' for browser Web Push
-        # (idempotent — MODIFY is a no-op if it already includes 'web').
-        try:
-            cursor.execute(
-                "ALTER TABLE device_tokens MODIFY platform ENUM('ios','android','web') NOT NULL"
-            )
-        except Error:
-            pass  # table may not exist yet on a brand-new DB (schema.sql already has 'web')
+        # Widen the device_tokens.platform enum to include 'web' for browser Web Push.
+        # Probe the column type first: an unconditional MODIFY takes a metadata
+        # lock (and on older MariaDB copies the table) on every startup even
+        # when nothing changes. No row → table not created yet; schema.sql
+        # already has 'web'.
+        cursor.execute(
+            "SELECT COLUMN_TYPE FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = 'device_tokens' AND column_name = 'platform'"
+        )
+        row = cursor.fetchone()
+        if row is not None:
+            column_type = row[0].decode() if isinstance(row[0], (bytes, bytearray)) else str(row[0])
+            if "'web'" not in column_type:
+                cursor.execute(
+                    "ALTER TABLE device_tokens MODIFY platform ENUM('ios','android','web') NOT NULL"
+                )
         conn.commit()
     except Error as e:
         log.warning(f"⚠️  Database error init_pause_reasons_table: {e}")
@@ -2366,12 +2881,12 @@ def init_pause_reasons_table() -> None:
 def pause_reason_list(active_only: bool = False, include_system: bool = True) -> list:
     """Return pause reasons ordered by sort_order. active_only hides inactive codes;
     include_system=False hides system codes."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     out = []
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         conditions = []
         if active_only:
@@ -2395,11 +2910,11 @@ def pause_reason_create(code: str, label: str, productive: bool = False,
     label = (label or '').strip()
     if not code or not label:
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO pause_reasons (code, label, productive, color, sort_order, is_active, is_system) "
@@ -2436,11 +2951,11 @@ def pause_reason_update(reason_id: int, fields: dict) -> bool:
     if not sets:
         return False
     params.append(reason_id)
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(f"UPDATE pause_reasons SET {', '.join(sets)} WHERE id = %s", tuple(params))
         conn.commit()
@@ -2456,11 +2971,11 @@ def pause_reason_delete(reason_id: int) -> bool:
     """Delete a non-system pause reason."""
     if not reason_id:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM pause_reasons WHERE id = %s AND is_system = 0", (reason_id,))
         ok = cursor.rowcount > 0
@@ -2477,11 +2992,11 @@ def pause_reason_get(code: str) -> Optional[dict]:
     """Return a single pause reason by code, or None."""
     if not code:
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT id, code, label, productive, color, sort_order, is_active, is_system "
@@ -2501,11 +3016,11 @@ def pause_reason_get(code: str) -> Optional[dict]:
 # recorder (backend/agent_presence.py) is the only writer.
 def init_agent_activity_table() -> None:
     """Create the agent_activity table (if missing). Idempotent; called at startup."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS agent_activity (
@@ -2541,11 +3056,11 @@ def agent_activity_transition(agent_ext: str, new_state: Optional[str], reason_c
     ext = str(agent_ext or '').strip()
     if not ext:
         return None
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE agent_activity SET ended_at = NOW(), "
@@ -2574,11 +3089,11 @@ def agent_activity_close_all_open(source: str = 'system') -> int:
     """Close every open segment. Used at startup before re-hydrating from live queue
     state, so a segment left open by a previous process is clamped to now rather than
     counting time while the backend was down. Returns rows affected."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE agent_activity SET ended_at = NOW(), "
@@ -2643,11 +3158,11 @@ def init_api_keys_table() -> None:
     executes schema.sql when the OpDesk database does not already exist, so an
     upgraded install would never get this table from the schema file alone.
     """
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS api_keys (
@@ -2701,11 +3216,11 @@ def create_api_key(name: str, scopes: List[str], created_by: Optional[int] = Non
     key_hash = _hash_api_key(plaintext)
     key_prefix = plaintext[:12]  # e.g. "opd_ab12cd34"
     scopes_json = json.dumps(list(scopes or []))
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO api_keys (name, key_prefix, key_hash, scopes, created_by, expires_at) "
@@ -2727,11 +3242,11 @@ def create_api_key(name: str, scopes: List[str], created_by: Optional[int] = Non
 
 def list_api_keys() -> List[dict]:
     """Return all API keys (metadata only, newest first)."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM api_keys ORDER BY created_at DESC, id DESC")
         return [_row_to_api_key(r) for r in cursor.fetchall()]
@@ -2744,11 +3259,11 @@ def list_api_keys() -> List[dict]:
 
 def get_api_key(key_id: int) -> Optional[dict]:
     """Return a single API key's metadata, or None."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM api_keys WHERE id = %s", (key_id,))
         row = cursor.fetchone()
@@ -2783,11 +3298,11 @@ def update_api_key(key_id: int, name: Optional[str] = None, scopes: Optional[Lis
     if not fields:
         return get_api_key(key_id)
     values.append(key_id)
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(f"UPDATE api_keys SET {', '.join(fields)} WHERE id = %s", values)
         conn.commit()
@@ -2801,11 +3316,11 @@ def update_api_key(key_id: int, name: Optional[str] = None, scopes: Optional[Lis
 
 def delete_api_key(key_id: int) -> bool:
     """Delete (revoke) an API key. Returns True if a row was removed."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM api_keys WHERE id = %s", (key_id,))
         conn.commit()
@@ -2827,11 +3342,11 @@ def lookup_api_key(plaintext: str) -> Optional[dict]:
     if not plaintext or not plaintext.startswith(API_KEY_PREFIX):
         return None
     key_hash = _hash_api_key(plaintext)
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT * FROM api_keys WHERE key_hash = %s AND enabled = 1 "
@@ -2878,11 +3393,11 @@ _DELIVERY_LIST_COLS = (
 
 def init_webhook_deliveries_table() -> None:
     """Create the webhook_deliveries table (if missing). Idempotent; called at startup."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS webhook_deliveries (
@@ -2943,11 +3458,11 @@ def insert_webhook_delivery(*, url: str, method: str = 'POST',
     req, req_trunc = _clip(request_body)
     resp, _ = _clip(response_body)
     err, _ = _clip(error)
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO webhook_deliveries "
@@ -3015,11 +3530,11 @@ def list_webhook_deliveries(success: Optional[bool] = None, call_id: Optional[st
         params.append(int(after_id))
     clause = (" WHERE " + " AND ".join(where)) if where else ""
 
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         # No COUNT(*): Rule 5.1 says expose `total` only where it is cheap, and it is
         # not cheap here. The lookahead row below answers "is there a next page?",
@@ -3047,11 +3562,11 @@ def list_webhook_deliveries(success: Optional[bool] = None, call_id: Optional[st
 
 def get_webhook_delivery(delivery_id: int) -> Optional[dict]:
     """Return one delivery row including the request/response bodies, or None."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM webhook_deliveries WHERE id = %s", (delivery_id,))
         row = cursor.fetchone()
@@ -3080,11 +3595,11 @@ def prune_webhook_deliveries(days: int = 30) -> int:
         days = max(1, int(days))
     except (TypeError, ValueError):
         days = 30
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "DELETE FROM webhook_deliveries WHERE created_at < DATE_SUB(NOW(), INTERVAL %s DAY)",
@@ -3105,11 +3620,11 @@ def prune_webhook_deliveries(days: int = 30) -> int:
 # ---------------------------------------------------------------------------
 def init_contacts_table() -> None:
     """Create the contacts table (if missing). Idempotent; called at startup."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS contacts (
@@ -3134,11 +3649,11 @@ def init_contacts_table() -> None:
 
 def list_contacts() -> list:
     """All contacts, manual and crm, sorted by name."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor(dictionary=True)
         cursor.execute(
             "SELECT id, name, phone, phone_key, company, notes, source, created_at, updated_at "
@@ -3156,11 +3671,11 @@ def create_contact(name: str, phone: str, phone_key: str,
                    company: Optional[str], notes: Optional[str]) -> Optional[int]:
     """Insert a manual contact. Returns the new id, or None when phone_key is
     already taken (unique key) or on DB error."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO contacts (name, phone, phone_key, company, notes, source) "
@@ -3184,11 +3699,11 @@ def update_contact(contact_id: int, name: str, phone: str, phone_key: str,
     """Update a contact (flips source to manual — the row is curated now).
     True on success, False when the id does not exist, None when the new
     phone_key collides with another contact."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE contacts SET name=%s, phone=%s, phone_key=%s, company=%s, notes=%s, "
@@ -3213,11 +3728,11 @@ def update_contact(contact_id: int, name: str, phone: str, phone_key: str,
 
 def delete_contact(contact_id: int) -> bool:
     """Delete a contact by id. True when a row was removed."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM contacts WHERE id=%s", (contact_id,))
         conn.commit()
@@ -3234,11 +3749,11 @@ def add_crm_contact_if_new(phone: str, phone_key: str, name: str) -> bool:
     data must never be overwritten by a lookup). True when a row was added."""
     if not phone_key or not name:
         return False
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT IGNORE INTO contacts (name, phone, phone_key, source) VALUES (%s,%s,%s,'crm')",
@@ -3255,11 +3770,11 @@ def add_crm_contact_if_new(phone: str, phone_key: str, name: str) -> bool:
 
 def get_contacts_for_resolver() -> list:
     """(phone_key, name) pairs for the ContactResolver's in-memory dict."""
-    config = get_db_config(os.getenv('DB_PASSWORD', ''), os.getenv('DB_OpDesk', 'OpDesk'))
+    config = _OPDESK_DB_CONFIG
     conn = None
     cursor = None
     try:
-        conn = mysql.connector.connect(**config)
+        conn = _get_connection(config)
         cursor = conn.cursor()
         cursor.execute("SELECT phone_key, name FROM contacts")
         return cursor.fetchall() or []
@@ -37,8 +37,8 @@ from api import AppError, PageParams, codes, encode_cursor, install_contract, re
 
 from ami import AMIExtensionsMonitor, _format_duration, DIALPLAN_CTX, normalize_interface
 from db_manager import (
-    get_extensions_from_db, get_extension_names_from_db, get_queue_names_from_db, init_settings_table,
-    get_setting, set_setting, get_all_settings, authenticate_user, get_call_log_count_from_db, get_call_notifications_from_db, get_call_notification_by_id, update_call_notification_status,
+    get_extensions_from_db, invalidate_extensions_cache, get_extension_names_from_db, get_queue_names_from_db, init_settings_table,
+    get_setting, set_setting, set_many_settings, settings_batch, get_all_settings, authenticate_user, get_call_log_count_from_db, get_call_notifications_from_db, get_call_notification_by_id, update_call_notification_status,
     get_cdr_by_linkedid,
     get_all_users, get_user_by_id, get_user_webrtc_credentials, create_user as db_create_user, update_user as db_update_user,
     delete_user as db_delete_user, get_user_agents_and_queues, get_agent_login_queues, get_user_group_ids, set_user_groups,get_groups_list, get_group,
@@ -769,6 +769,8 @@ def init_crm_connector() -> Optional[CRMConnector]:
             CRM_ENDPOINT_PATH: API endpoint path (default: '/api/calls')
             CRM_TIMEOUT: Request timeout in seconds (default: 30)
             CRM_VERIFY_SSL: Verify SSL certificates (default: 'true')
+            CRM_BATCH_MODE: Coalesce concurrent pushes into one {"calls": [...]} POST
+                            (default: 'false'; the CRM endpoint must accept that body)
     
     Returns:
         CRMConnector instance if configured, None otherwise
@@ -802,7 +804,8 @@ def init_crm_connector() -> Optional[CRMConnector]:
         "auth_type": auth_type_str,
         "endpoint_path": get_setting('CRM_ENDPOINT_PATH', os.getenv('CRM_ENDPOINT_PATH', '/api/calls')),
         "timeout": int(get_setting('CRM_TIMEOUT', os.getenv('CRM_TIMEOUT', '30'))),
-        "verify_ssl": get_setting('CRM_VERIFY_SSL', os.getenv('CRM_VERIFY_SSL', 'true')).lower() in ('true', '1', 'yes')
+        "verify_ssl": get_setting('CRM_VERIFY_SSL', os.getenv('CRM_VERIFY_SSL', 'true')).lower() in ('true', '1', 'yes'),
+        "batch_mode": get_setting('CRM_BATCH_MODE', os.getenv('CRM_BATCH_MODE', 'false')).lower() in ('true', '1', 'yes')
     }
     
     # Add auth-specific configuration (from database, fallback to env)
@@ -1040,6 +1043,7 @@ async def lifespan(app: FastAPI):
         'CRM_ENDPOINT_PATH': '/api/calls',
         'CRM_TIMEOUT': '30',
         'CRM_VERIFY_SSL': 'true',
+        'CRM_BATCH_MODE': 'false',
         # Call-data sync (push) — defaults reproduce the original fixed payload so
         # enabling CRM on an upgraded install keeps the exact same behaviour.
         'CRM_SYNC_ENABLED': 'true',
@@ -1139,7 +1143,7 @@ async def lifespan(app: FastAPI):
         log.info("Connected to AMI")
         
         # Load extensions
-        extensions = get_extensions_from_db()
+        extensions = await asyncio.to_thread(get_extensions_from_db)
         if extensions:
             monitor.monitored = set(str(e) for e in extensions)
             log.info(f"Monitoring {len(extensions)} extensions")
@@ -2711,7 +2715,9 @@ async def handle_client_message(websocket: WebSocket, message: dict):
             # Full sync: reconcile extensions/queues with the PBX (prune removed ones,
             # refresh names every time), then resync live status/calls/queues.
             if monitor:
-                extensions = get_extensions_from_db()
+                # An explicit sync must see the PBX as it is now, not a cached list.
+                invalidate_extensions_cache()
+                extensions = await asyncio.to_thread(get_extensions_from_db)
                 # None == PBX read failed → keep current state, never prune. A real
                 # (possibly empty) list is authoritative and safe to prune against.
                 if extensions is not None:
@@ -3222,8 +3228,7 @@ async def enable_mobile_wake_endpoint(body: MobileWakeConfigBody = MobileWakeCon
     try:
         wait = max(1, min(body.wait_seconds, 30))
         if enable_mobile_wake(wait_seconds=wait):
-            set_setting('MOBILE_WAKE_ENABLED', 'true')
-            set_setting('MOBILE_WAKE_WAIT', str(wait))
+            set_many_settings({'MOBILE_WAKE_ENABLED': 'true', 'MOBILE_WAKE_WAIT': str(wait)})
             return respond({"message": f"Mobile wake enabled (wait={wait}s). Asterisk dialplan reloaded."})
         raise HTTPException(status_code=500, detail="Failed to enable mobile wake. Check server logs.")
     except HTTPException:
@@ -3272,8 +3277,7 @@ async def enable_recording_endpoint(body: RecordingConfigBody = RecordingConfigB
         if fmt not in ("wav", "wav49", "gsm", "g722", "ulaw", "alaw", "sln"):
             raise HTTPException(status_code=400, detail=f"Unsupported recording format: {fmt}")
         if enable_recording(mix_format=fmt):
-            set_setting('RECORDING_ENABLED', 'true')
-            set_setting('RECORDING_FORMAT', fmt)
+            set_many_settings({'RECORDING_ENABLED': 'true', 'RECORDING_FORMAT': fmt})
             return respond({"message": f"Call recording enabled (format={fmt}). Asterisk dialplan reloaded."})
         raise HTTPException(status_code=500, detail="Failed to enable call recording. Check server logs.")
     except HTTPException:
@@ -3366,157 +3370,160 @@ async def save_crm_config(config_data: dict, current_user: dict = Depends(requir
         # Get existing settings to preserve masked values
         existing_settings = get_all_settings()
 
-        # Save basic CRM settings
-        set_setting('CRM_ENABLED', 'true' if config_data.get('enabled') else 'false')
-        set_setting('CRM_SERVER_URL', config_data.get('server_url', ''))
-        set_setting('CRM_AUTH_TYPE', config_data.get('auth_type', 'api_key'))
-        set_setting('CRM_ENDPOINT_PATH', config_data.get('endpoint_path', '/api/calls'))
-        set_setting('CRM_TIMEOUT', str(config_data.get('timeout', 30)))
-        set_setting('CRM_VERIFY_SSL', 'true' if config_data.get('verify_ssl', True) else 'false')
+        # One transaction for the whole save: a validation error part-way
+        # through (HTTPException below) now leaves the stored config untouched.
+        with settings_batch():
+            # Save basic CRM settings
+            set_setting('CRM_ENABLED', 'true' if config_data.get('enabled') else 'false')
+            set_setting('CRM_SERVER_URL', config_data.get('server_url', ''))
+            set_setting('CRM_AUTH_TYPE', config_data.get('auth_type', 'api_key'))
+            set_setting('CRM_ENDPOINT_PATH', config_data.get('endpoint_path', '/api/calls'))
+            set_setting('CRM_TIMEOUT', str(config_data.get('timeout', 30)))
+            set_setting('CRM_VERIFY_SSL', 'true' if config_data.get('verify_ssl', True) else 'false')
         
-        # Handle auth-specific settings
-        # For sensitive fields (password, api_key, bearer_token, oauth2_client_secret),
-        # preserve existing value if new value is "***" (masked) or empty
-        auth_type = config_data.get('auth_type', 'api_key')
-        if auth_type == 'api_key':
-            api_key = config_data.get('api_key', '')
-            if api_key and api_key != '***':
-                set_setting('CRM_API_KEY', api_key)
-            elif 'CRM_API_KEY' in existing_settings:
-                # Preserve existing API key
-                pass  # Already in database
-            if config_data.get('api_key_header'):
-                set_setting('CRM_API_KEY_HEADER', config_data.get('api_key_header', ''))
-        elif auth_type == 'basic_auth':
-            if config_data.get('username'):
-                set_setting('CRM_USERNAME', config_data.get('username', ''))
-            password = config_data.get('password', '')
-            if password and password != '***':
-                set_setting('CRM_PASSWORD', password)
-            elif 'CRM_PASSWORD' in existing_settings:
-                # Preserve existing password
-                pass  # Already in database
-        elif auth_type == 'bearer_token':
-            bearer_token = config_data.get('bearer_token', '')
-            if bearer_token and bearer_token != '***':
-                set_setting('CRM_BEARER_TOKEN', bearer_token)
-            elif 'CRM_BEARER_TOKEN' in existing_settings:
-                # Preserve existing bearer token
-                pass  # Already in database
-        elif auth_type == 'oauth2':
-            if config_data.get('oauth2_client_id'):
-                set_setting('CRM_OAUTH2_CLIENT_ID', config_data.get('oauth2_client_id', ''))
-            oauth2_secret = config_data.get('oauth2_client_secret', '')
-            if oauth2_secret and oauth2_secret != '***':
-                set_setting('CRM_OAUTH2_CLIENT_SECRET', oauth2_secret)
-            elif 'CRM_OAUTH2_CLIENT_SECRET' in existing_settings:
-                # Preserve existing OAuth2 client secret
-                pass  # Already in database
-            if config_data.get('oauth2_token_url'):
-                set_setting('CRM_OAUTH2_TOKEN_URL', config_data.get('oauth2_token_url', ''))
-            if config_data.get('oauth2_scope'):
-                set_setting('CRM_OAUTH2_SCOPE', config_data.get('oauth2_scope', ''))
-
-        # ── Call-data sync (push) settings ──
-        # Older clients may POST without these keys; default to "on / all" so the
-        # legacy behaviour is preserved and nothing is silently disabled.
-        set_setting('CRM_SYNC_ENABLED', 'true' if config_data.get('sync_enabled', True) else 'false')
-        sync_method = str(config_data.get('sync_method', 'POST')).upper()
-        set_setting('CRM_SYNC_METHOD', 'PUT' if sync_method == 'PUT' else 'POST')
-        if 'sync_endpoint' in config_data:
-            set_setting('CRM_SYNC_ENDPOINT', (config_data.get('sync_endpoint') or '').strip())
-        if 'sync_fields' in config_data:
-            cleaned = parse_sync_fields(config_data.get('sync_fields')) if parse_sync_fields else []
-            # Never persist an empty selection — fall back to the compatible default,
-            # but tell the operator we did so instead of silently reverting.
-            if cleaned:
-                set_setting('CRM_SYNC_FIELDS', ','.join(cleaned))
-                # No field is forced into the body any more, so a selection with
-                # neither identity field produces calls the CRM cannot attribute.
-                if 'caller' not in cleaned and 'destination' not in cleaned:
-                    warnings.append(
-                        "Neither Caller nor Destination is selected — the CRM will "
-                        "receive calls it cannot identify.")
-            else:
-                set_setting('CRM_SYNC_FIELDS', ','.join(DEFAULT_CRM_SYNC_FIELDS))
-                warnings.append("No sync fields were selected — reverted to the default field set.")
-        set_setting('CRM_SYNC_DIR_INBOUND', 'true' if config_data.get('sync_dir_inbound', True) else 'false')
-        set_setting('CRM_SYNC_DIR_OUTBOUND', 'true' if config_data.get('sync_dir_outbound', True) else 'false')
-        set_setting('CRM_SYNC_DIR_INTERNAL', 'true' if config_data.get('sync_dir_internal', True) else 'false')
-        set_setting('CRM_BLOCK_PRIVATE', 'true' if config_data.get('block_private', False) else 'false')
-
-        # ── Payload shaping: duration unit, outcome remap, outbound key rename ──
-        # Validated before persisting rather than silently coerced: a dropped rename
-        # or a bad unit is invisible in the payload, so the operator has to be told.
-        if 'sync_duration_format' in config_data:
-            fmt = str(config_data.get('sync_duration_format') or 'hms').strip().lower()
-            if fmt not in ('hms', 'seconds'):
-                raise HTTPException(
-                    status_code=400,
-                    detail="sync_duration_format must be 'hms' or 'seconds'")
-            set_setting('CRM_SYNC_DURATION_FORMAT', fmt)
-
-        if 'sync_key_map' in config_data and parse_key_map:
-            raw_map = config_data.get('sync_key_map') or {}
-            parsed = parse_key_map(raw_map)
-            if isinstance(raw_map, dict):
-                dropped = [k for k in raw_map if k not in parsed and str(raw_map.get(k) or '').strip()]
-                if dropped:
+            # Handle auth-specific settings
+            # For sensitive fields (password, api_key, bearer_token, oauth2_client_secret),
+            # preserve existing value if new value is "***" (masked) or empty
+            auth_type = config_data.get('auth_type', 'api_key')
+            if auth_type == 'api_key':
+                api_key = config_data.get('api_key', '')
+                if api_key and api_key != '***':
+                    set_setting('CRM_API_KEY', api_key)
+                elif 'CRM_API_KEY' in existing_settings:
+                    # Preserve existing API key
+                    pass  # Already in database
+                if config_data.get('api_key_header'):
+                    set_setting('CRM_API_KEY_HEADER', config_data.get('api_key_header', ''))
+            elif auth_type == 'basic_auth':
+                if config_data.get('username'):
+                    set_setting('CRM_USERNAME', config_data.get('username', ''))
+                password = config_data.get('password', '')
+                if password and password != '***':
+                    set_setting('CRM_PASSWORD', password)
+                elif 'CRM_PASSWORD' in existing_settings:
+                    # Preserve existing password
+                    pass  # Already in database
+            elif auth_type == 'bearer_token':
+                bearer_token = config_data.get('bearer_token', '')
+                if bearer_token and bearer_token != '***':
+                    set_setting('CRM_BEARER_TOKEN', bearer_token)
+                elif 'CRM_BEARER_TOKEN' in existing_settings:
+                    # Preserve existing bearer token
+                    pass  # Already in database
+            elif auth_type == 'oauth2':
+                if config_data.get('oauth2_client_id'):
+                    set_setting('CRM_OAUTH2_CLIENT_ID', config_data.get('oauth2_client_id', ''))
+                oauth2_secret = config_data.get('oauth2_client_secret', '')
+                if oauth2_secret and oauth2_secret != '***':
+                    set_setting('CRM_OAUTH2_CLIENT_SECRET', oauth2_secret)
+                elif 'CRM_OAUTH2_CLIENT_SECRET' in existing_settings:
+                    # Preserve existing OAuth2 client secret
+                    pass  # Already in database
+                if config_data.get('oauth2_token_url'):
+                    set_setting('CRM_OAUTH2_TOKEN_URL', config_data.get('oauth2_token_url', ''))
+                if config_data.get('oauth2_scope'):
+                    set_setting('CRM_OAUTH2_SCOPE', config_data.get('oauth2_scope', ''))
+
+            # ── Call-data sync (push) settings ──
+            # Older clients may POST without these keys; default to "on / all" so the
+            # legacy behaviour is preserved and nothing is silently disabled.
+            set_setting('CRM_SYNC_ENABLED', 'true' if config_data.get('sync_enabled', True) else 'false')
+            sync_method = str(config_data.get('sync_method', 'POST')).upper()
+            set_setting('CRM_SYNC_METHOD', 'PUT' if sync_method == 'PUT' else 'POST')
+            if 'sync_endpoint' in config_data:
+                set_setting('CRM_SYNC_ENDPOINT', (config_data.get('sync_endpoint') or '').strip())
+            if 'sync_fields' in config_data:
+                cleaned = parse_sync_fields(config_data.get('sync_fields')) if parse_sync_fields else []
+                # Never persist an empty selection — fall back to the compatible default,
+                # but tell the operator we did so instead of silently reverting.
+                if cleaned:
+                    set_setting('CRM_SYNC_FIELDS', ','.join(cleaned))
+                    # No field is forced into the body any more, so a selection with
+                    # neither identity field produces calls the CRM cannot attribute.
+                    if 'caller' not in cleaned and 'destination' not in cleaned:
+                        warnings.append(
+                            "Neither Caller nor Destination is selected — the CRM will "
+                            "receive calls it cannot identify.")
+                else:
+                    set_setting('CRM_SYNC_FIELDS', ','.join(DEFAULT_CRM_SYNC_FIELDS))
+                    warnings.append("No sync fields were selected — reverted to the default field set.")
+            set_setting('CRM_SYNC_DIR_INBOUND', 'true' if config_data.get('sync_dir_inbound', True) else 'false')
+            set_setting('CRM_SYNC_DIR_OUTBOUND', 'true' if config_data.get('sync_dir_outbound', True) else 'false')
+            set_setting('CRM_SYNC_DIR_INTERNAL', 'true' if config_data.get('sync_dir_internal', True) else 'false')
+            set_setting('CRM_BLOCK_PRIVATE', 'true' if config_data.get('block_private', False) else 'false')
+
+            # ── Payload shaping: duration unit, outcome remap, outbound key rename ──
+            # Validated before persisting rather than silently coerced: a dropped rename
+            # or a bad unit is invisible in the payload, so the operator has to be told.
+            if 'sync_duration_format' in config_data:
+                fmt = str(config_data.get('sync_duration_format') or 'hms').strip().lower()
+                if fmt not in ('hms', 'seconds'):
+                    raise HTTPException(
+                        status_code=400,
+                        detail="sync_duration_format must be 'hms' or 'seconds'")
+                set_setting('CRM_SYNC_DURATION_FORMAT', fmt)
+
+            if 'sync_key_map' in config_data and parse_key_map:
+                raw_map = config_data.get('sync_key_map') or {}
+                parsed = parse_key_map(raw_map)
+                if isinstance(raw_map, dict):
+                    dropped = [k for k in raw_map if k not in parsed and str(raw_map.get(k) or '').strip()]
+                    if dropped:
+                        warnings.append(
+                            "Ignored key rename(s) for unknown outbound key(s): "
+                            + ", ".join(sorted(dropped)))
+                set_setting('CRM_SYNC_KEY_MAP', json.dumps(parsed))
+
+            if 'sync_status_map' in config_data and parse_status_map:
+                raw_map = config_data.get('sync_status_map') or {}
+                parsed = parse_status_map(raw_map)
+                unknown = [k for k in parsed if k not in CALL_OUTCOMES]
+                if unknown:
                     warnings.append(
-                        "Ignored key rename(s) for unknown outbound key(s): "
-                        + ", ".join(sorted(dropped)))
-            set_setting('CRM_SYNC_KEY_MAP', json.dumps(parsed))
-
-        if 'sync_status_map' in config_data and parse_status_map:
-            raw_map = config_data.get('sync_status_map') or {}
-            parsed = parse_status_map(raw_map)
-            unknown = [k for k in parsed if k not in CALL_OUTCOMES]
-            if unknown:
-                warnings.append(
-                    "Outcome remap source(s) not produced by OpDesk (will never match): "
-                    + ", ".join(sorted(unknown)))
-            set_setting('CRM_SYNC_STATUS_MAP', json.dumps(parsed))
-
-        # ── Contact lookup settings ──
-        # The lookup URL is a *path template* appended to the already-SSRF-validated
-        # server URL; refusing absolute URLs keeps that single validation surface.
-        if 'lookup_enabled' in config_data:
-            set_setting('CRM_LOOKUP_ENABLED', 'true' if config_data.get('lookup_enabled') else 'false')
-        if 'lookup_url' in config_data:
-            lookup_url = (config_data.get('lookup_url') or '').strip()
-            if lookup_url and (not lookup_url.startswith('/') or '://' in lookup_url):
-                log.warning(f"CRM config save rejected: lookup_url is not a path ({lookup_url[:80]!r})")
-                raise HTTPException(
-                    status_code=400,
-                    detail="lookup_url must be a path starting with '/' (it is appended to the CRM server URL)")
-            set_setting('CRM_LOOKUP_URL', lookup_url)
-        if 'lookup_name_template' in config_data:
-            set_setting('CRM_LOOKUP_NAME_TEMPLATE', (config_data.get('lookup_name_template') or '').strip())
-        if 'lookup_number_format' in config_data:
-            fmt = str(config_data.get('lookup_number_format') or 'digits').strip().lower()
-            if fmt not in LOOKUP_NUMBER_FORMATS:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"lookup_number_format must be one of: {', '.join(LOOKUP_NUMBER_FORMATS)}")
-            set_setting('CRM_LOOKUP_NUMBER_FORMAT', fmt)
-        if 'lookup_match_digits' in config_data:
-            try:
-                match_digits = int(config_data.get('lookup_match_digits') or 0)
-            except (TypeError, ValueError):
-                raise HTTPException(status_code=400, detail="lookup_match_digits must be an integer >= 0")
-            if match_digits < 0:
-                raise HTTPException(status_code=400, detail="lookup_match_digits must be an integer >= 0")
-            set_setting('CRM_LOOKUP_MATCH_DIGITS', str(match_digits))
-        if 'lookup_verify_path' in config_data:
-            set_setting('CRM_LOOKUP_VERIFY_PATH', (config_data.get('lookup_verify_path') or '').strip())
-        if 'lookup_ttl_hours' in config_data:
-            try:
-                ttl_hours = int(config_data.get('lookup_ttl_hours') or 24)
-            except (TypeError, ValueError):
-                raise HTTPException(status_code=400, detail="lookup_ttl_hours must be a positive integer")
-            if ttl_hours < 1:
-                raise HTTPException(status_code=400, detail="lookup_ttl_hours must be a positive integer")
-            set_setting('CRM_LOOKUP_TTL_HOURS', str(ttl_hours))
+                        "Outcome remap source(s) not produced by OpDesk (will never match): "
+                        + ", ".join(sorted(unknown)))
+                set_setting('CRM_SYNC_STATUS_MAP', json.dumps(parsed))
+
+            # ── Contact lookup settings ──
+            # The lookup URL is a *path template* appended to the already-SSRF-validated
+            # server URL; refusing absolute URLs keeps that single validation surface.
+            if 'lookup_enabled' in config_data:
+                set_setting('CRM_LOOKUP_ENABLED', 'true' if config_data.get('lookup_enabled') else 'false')
+            if 'lookup_url' in config_data:
+                lookup_url = (config_data.get('lookup_url') or '').strip()
+                if lookup_url and (not lookup_url.startswith('/') or '://' in lookup_url):
+                    log.warning(f"CRM config save rejected: lookup_url is not a path ({lookup_url[:80]!r})")
+                    raise HTTPException(
+                        status_code=400,
+                        detail="lookup_url must be a path starting with '/' (it is appended to the CRM server URL)")
+                set_setting('CRM_LOOKUP_URL', lookup_url)
+            if 'lookup_name_template' in config_data:
+                set_setting('CRM_LOOKUP_NAME_TEMPLATE', (config_data.get('lookup_name_template') or '').strip())
+            if 'lookup_number_format' in config_data:
+                fmt = str(config_data.get('lookup_number_format') or 'digits').strip().lower()
+                if fmt not in LOOKUP_NUMBER_FORMATS:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"lookup_number_format must be one of: {', '.join(LOOKUP_NUMBER_FORMATS)}")
+                set_setting('CRM_LOOKUP_NUMBER_FORMAT', fmt)
+            if 'lookup_match_digits' in config_data:
+                try:
+                    match_digits = int(config_data.get('lookup_match_digits') or 0)
+                except (TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail="lookup_match_digits must be an integer >= 0")
+                if match_digits < 0:
+                    raise HTTPException(status_code=400, detail="lookup_match_digits must be an integer >= 0")
+                set_setting('CRM_LOOKUP_MATCH_DIGITS', str(match_digits))
+            if 'lookup_verify_path' in config_data:
+                set_setting('CRM_LOOKUP_VERIFY_PATH', (config_data.get('lookup_verify_path') or '').strip())
+            if 'lookup_ttl_hours' in config_data:
+                try:
+                    ttl_hours = int(config_data.get('lookup_ttl_hours') or 24)
+                except (TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail="lookup_ttl_hours must be a positive integer")
+                if ttl_hours < 1:
+                    raise HTTPException(status_code=400, detail="lookup_ttl_hours must be a positive integer")
+                set_setting('CRM_LOOKUP_TTL_HOURS', str(ttl_hours))
 
         log.info("CRM configuration saved to database")
 
@@ -3524,6 +3531,7 @@ async def save_crm_config(config_data: dict, current_user: dict = Depends(requir
         # the live AMI monitor so changes take effect without a restart.
         global crm_connector, monitor
         reload_ok = True
+        old_connector = crm_connector
         try:
             crm_connector = init_crm_connector()
             new_sync = load_crm_sync_config()
@@ -3536,6 +3544,14 @@ async def save_crm_config(config_data: dict, current_user: dict = Depends(requir
             reload_ok = False
             log.error(f"CRM config saved but live reload failed (restart to apply): {e}")
             warnings.append("Configuration saved, but applying it live failed — restart the server to apply.")
+        # The replaced connector owns a keep-alive pool (and a batch worker in
+        # batch mode). Once the monitor and resolver hold the new one, nothing
+        # references it any more, so release it now.
+        if reload_ok and old_connector is not None and old_connector is not crm_connector:
+            try:
+                await old_connector.close()
+            except Exception as e:
+                log.warning(f"Failed to close previous CRM connector: {e}")
 
         return {
             "success": True,
@@ -3853,12 +3869,19 @@ async def get_call_log_endpoint(
 
         allowed_ext = None if current_user.get("role") == "admin" else (current_user.get("allowed_agent_extensions") or [])
         search_q = (search or "").strip() or None
-        data = get_call_log(limit=limit, date=date,
-                            date_from=date_from, date_to=date_to,
-                            allowed_extensions=allowed_ext, search=search_q)
-        total = get_call_log_count_from_db(date=date, date_from=date_from, date_to=date_to,
-                                           allowed_extensions=allowed_ext, search=search_q)
+        # Rows and total are independent queries: run them side by side on
+        # worker threads (each takes its own pooled connection) instead of
+        # back to back on the event loop.
+        data, total = await asyncio.gather(
+            asyncio.to_thread(get_call_log, limit=limit, date=date,
+                              date_from=date_from, date_to=date_to,
+                              allowed_extensions=allowed_ext, search=search_q),
+            asyncio.to_thread(get_call_log_count_from_db, date=date, date_from=date_from, date_to=date_to,
+                              allowed_extensions=allowed_ext, search=search_q),
+        )
         return {"calls": data, "total": total}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         log.error(f"Error fetching call log: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch call log: {str(e)}")
@@ -4050,13 +4073,16 @@ async def save_settings(settings_data: dict, current_user: dict = Depends(requir
         saved_settings = []
         failed_settings = []
         
-        for key, value in settings_data.items():
-            # Convert value to string if it's not already
-            value_str = str(value) if value is not None else ''
-            if set_setting(key, value_str):
-                saved_settings.append(key)
-            else:
-                failed_settings.append(key)
+        # One connection and one commit for the whole form; a key that fails
+        # is still reported on its own (MySQL keeps the rest of the transaction).
+        with settings_batch():
+            for key, value in settings_data.items():
+                # Convert value to string if it's not already
+                value_str = str(value) if value is not None else ''
+                if set_setting(key, value_str):
+                    saved_settings.append(key)
+                else:
+                    failed_settings.append(key)
         
         if failed_settings:
             log.warning(f"Failed to save some settings: {failed_settings}")